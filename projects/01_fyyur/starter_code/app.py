@@ -3,199 +3,442 @@
 #----------------------------------------------------------------------------#
 
 import json
-import dateutil.parser
-import babel
-from babel import dates
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify
+import hashlib
+import hmac
+import os
+from flask import Flask, current_app, render_template, request, Response, flash, redirect, url_for, abort, jsonify, stream_with_context
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-import logging
-from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
-from flask_migrate import Migrate
+from psycopg2 import errorcodes
+from sqlalchemy import Integer, DateTime, and_, column, func, literal, or_, select, true, tuple_, union_all, values
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from forms import MAX_DURATION_MINUTES, MAX_ID, ArtistForm, ShowForm, VenueForm
+from cache import PageCache
+from assets import Assets, build_assets
+from models import db, Venue, Artist, Show, UpcomingShow
+import dashboard
+import importer
+import exporter
+import pool_metrics
+import purge
+import upcoming
+from routing import ReplicaRouter, replica_binds, replica_reads
+from sql_profiler import SQLProfiler
+from compression import Compress
+from queue_logging import QueueLogging
 import time
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import groupby
+from urllib.parse import urlencode
 
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-
-migrate = Migrate(app, db)
-# TODO: connect to a local postgresql database
+moment = Moment()
+page_cache = PageCache()
+replica_router = ReplicaRouter()
+sql_profiler = SQLProfiler()
+assets = Assets()
+compress = Compress()
+queue_logging = QueueLogging()
+
+# Views and error handlers are collected here and added to each app by
+# create_app(), under their plain endpoint names (url_for('venues')).
+url_rules = []
+error_handlers = []
+# The /_stats/ views are only added with STATS_ENABLED set.
+stats_rules = []
+
+
+def route(rule, **options):
+    def decorator(view):
+        url_rules.append((rule, view, options))
+        return view
+    return decorator
+
+
+def stats_route(rule):
+    def decorator(view):
+        stats_rules.append((rule, view))
+        return view
+    return decorator
+
+
+def errorhandler(code):
+    def decorator(handler):
+        error_handlers.append((code, handler))
+        return handler
+    return decorator
+
+
+def create_app(test_config=None):
+    app = Flask(__name__)
+    app.config.from_object('config')
+    if test_config is not None:
+        app.config.update(test_config)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {}).setdefault('poolclass', pool_metrics.TimedQueuePool)
+    app.config['SQLALCHEMY_BINDS'] = dict(app.config.get('SQLALCHEMY_BINDS') or {},
+                                         **replica_binds(app.config.get('REPLICA_DATABASE_URIS', [])))
+    db.init_app(app)
+    moment.init_app(app)
+    page_cache.init_app(app)
+    replica_router.init_app(app, db)
+    sql_profiler.init_app(app)
+    assets.init_app(app)
+    compress.init_app(app)
+
+    # Flask-Migrate imports alembic, which only the "flask" command needs.
+    if os.environ.get('FLASK_RUN_FROM_CLI'):
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    app.cli.add_command(importer.import_catalogue)
+    app.cli.add_command(exporter.export_catalogue)
+    app.cli.add_command(pool_metrics.pool_stats)
+    app.cli.add_command(upcoming.refresh_upcoming)
+    app.cli.add_command(dashboard.refresh_dashboard)
+    app.cli.add_command(purge.purge_catalogue)
+    app.cli.add_command(build_assets)
+
+    app.jinja_env.filters['datetime'] = format_datetime
+    for rule, view, options in url_rules:
+        app.add_url_rule(rule, view_func=view, **options)
+    if app.config.get('STATS_ENABLED'):
+        for rule, view in stats_rules:
+            app.add_url_rule(rule, view_func=view)
+    for code, handler in error_handlers:
+        app.register_error_handler(code, handler)
+    queue_logging.init_app(app)
+    return app
 
 #----------------------------------------------------------------------------#
-# Models.
+# Filters.
 #----------------------------------------------------------------------------#
 
 
-class Venue(db.Model):
-    __tablename__ = 'Venue'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    genres = db.Column(db.ARRAY(db.String))
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    address = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    website = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    seeking_talent = db.Column(db.Boolean)
-    seeking_description = db.Column(db.String(120))
-    show = db.relationship('Show', passive_deletes=True, backref='Venue', lazy=True)
-
-
-class Artist(db.Model):
-    __tablename__ = 'Artist'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    website = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    seeking_venue = db.Column(db.Boolean)
-    seeking_description = db.Column(db.String(120))
-    show = db.relationship('Show', passive_deletes=True, backref='Artist', lazy=True)
-
-
-class Show(db.Model):
-    __tablename__ = 'Show'
-
-    id = db.Column(db.Integer, primary_key=True)
-    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'))
-    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'))
-    start_time = db.Column(db.DateTime)
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+# babel and dateutil are imported on first use rather than at startup.
+@lru_cache(maxsize=1)
+def datetime_locale():
+    from babel import Locale, dates
+    return Locale.parse(dates.LC_TIME)
+
+
+@lru_cache(maxsize=64)
+def datetime_pattern(format):
+    from babel import dates
+    return dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+
+
+def format_datetime(value, format='medium'):
+    # Views pass datetime objects; strings are still accepted but parsed.
+    if not isinstance(value, datetime):
+        import dateutil.parser
+        value = dateutil.parser.parse(value)
+    return datetime_pattern(format).apply(value, datetime_locale())
+
+
+def format_datetimes(values, format='medium'):
+    # A show list's times, with the pattern and locale looked up once.
+    pattern = datetime_pattern(format)
+    locale = datetime_locale()
+    return [pattern.apply(value, locale) for value in values]
+
+
+def with_start_times(shows, format='full'):
+    # Adds the formatted 'start_time_text' the show lists render, leaving
+    # 'start_time' a datetime for the JSON API.
+    for show, text in zip(shows, format_datetimes([show['start_time'] for show in shows], format)):
+        show['start_time_text'] = text
+    return shows
+
 
 #----------------------------------------------------------------------------#
-# Filters.
+# Cache invalidation.
 #----------------------------------------------------------------------------#
 
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format="EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format="EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
+def venue_cache_tags(venue_id):
+    # A venue's name and image appear on its own page, the listings and the
+    # pages of every artist that played there.
+    artist_ids = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+    return ['venues', 'shows', 'venue:{}'.format(venue_id)] + \
+        ['artist:{}'.format(artist_id) for artist_id, in artist_ids]
 
 
-app.jinja_env.filters['datetime'] = format_datetime
+def artist_cache_tags(artist_id):
+    venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+    return ['artists', 'shows', 'artist:{}'.format(artist_id)] + \
+        ['venue:{}'.format(venue_id) for venue_id, in venue_ids]
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
+def parse_cursor(cursor, parse_key):
+    # Cursors are "<sort key>,<id>" pairs taken from the last row of a page.
+    try:
+        key, row_id = cursor.rsplit(',', 1)
+        return parse_key(key), int(row_id)
+    except (AttributeError, ValueError):
+        abort(400)
+
+
+def genre_filter(model, args):
+    """Criteria for ?genre=Jazz&genre=Folk, matching rows with all of the
+    genres (array containment), or any of them with ?genre_match=any (array
+    overlap), and the filters to carry over into links. Both operators are
+    served by the GIN indexes on genres.
+    """
+    genres = [genre for genre in args.getlist('genre') if genre]
+    if not genres:
+        return [], {}
+    if args.get('genre_match') == 'any':
+        return [model.genres.overlap(genres)], {'genre': genres, 'genre_match': 'any'}
+    return [model.genres.contains(genres)], {'genre': genres}
+
+
+def genre_facets(query, model, **key):
+    """Number of rows matched by query per genre, most common first.
+
+    The counts cover every matching row, not one page of them, so they are
+    cached under key, which must identify the query, until a write to the
+    model invalidates its listing tag ('venues' or 'artists').
+    """
+    def compute():
+        genres = query.with_entities(func.unnest(model.genres).label('genre')). \
+            order_by(None).limit(None).offset(None).subquery()
+        count = func.count().label('count')
+        rows = db.session.query(genres.c.genre, count).group_by(genres.c.genre). \
+            order_by(count.desc(), genres.c.genre)
+        return [{'genre': genre, 'count': genre_count} for genre, genre_count in rows]
+    tag = model.__tablename__.lower() + 's'
+    key = 'genres:{}?{}'.format(tag, urlencode(sorted((name, value) for name, value in key.items()
+                                                      if value is not None), doseq=True))
+    return page_cache.remember(key, [tag], compute)
+
+
+@route('/')
+@page_cache.cached('venues', 'artists', 'shows')
+@replica_reads
 def index():
-    return render_template('pages/home.html')
+    return render_template('pages/home.html',
+                           dashboard=dashboard.summary(current_app.config['DASHBOARD_LIST_LENGTH']))
 
 
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
-def venues():
-    areas = db.session.query(Venue.city, Venue.state).distinct(Venue.city, Venue.state)
+def area_criterion(column, value):
+    # Area links pass a missing city or state as '', which matches NULL.
+    if value == '':
+        return or_(column.is_(None), column == '')
+    return column == value
+
+
+def venue_query(city=None, state=None, criteria=()):
+    query = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state).filter(*criteria). \
+        order_by(Venue.state, Venue.city, Venue.name, Venue.id)
+    if city is not None:
+        query = query.filter(area_criterion(Venue.city, city))
+    if state is not None:
+        query = query.filter(area_criterion(Venue.state, state))
+    return query
+
+
+def venue_areas(city=None, state=None, criteria=()):
     data = []
-    for area in areas:
-        areas = Venue.query.filter_by(state=area.state).filter_by(city=area.city).all()
-        venue_data = []
+    rows = venue_query(city, state, criteria).yield_per(1000)
+    for (area_city, area_state), venue_rows in groupby(rows, key=lambda row: (row.city, row.state)):
+        venue_data = [{'id': row.id, 'name': row.name} for row in venue_rows]
         data.append({
-            'city': area.city,
-            'state': area.state,
+            'city': area_city,
+            'state': area_state,
+            'num_venues': len(venue_data),
             'venues': venue_data
-                })
-        for venue in areas:
-            venue_data.append({
-                'id': venue.id,
-                'name': venue.name,
-                })
-    return render_template('pages/venues.html', areas=data)
+        })
+    return data
 
 
-@app.route('/venues/search', methods=['POST'])
+@route('/venues')
+@page_cache.cached('venues')
+@replica_reads
+def venues():
+    criteria, genre_filters = genre_filter(Venue, request.args)
+    if request.args.get('lazy', type=int):
+        # Area headers only; each header links to the area's own listing.
+        areas = db.session.query(Venue.city, Venue.state, func.count(Venue.id)).filter(*criteria). \
+            group_by(Venue.state, Venue.city).order_by(Venue.state, Venue.city)
+        data = [{
+            'city': area_city,
+            'state': area_state,
+            'num_venues': num_venues,
+            'venues': None
+        } for area_city, area_state, num_venues in areas]
+        return render_template('pages/venues.html', areas=data, lazy=True, genre_filters=genre_filters,
+                               genres=genre_facets(venue_query(criteria=criteria), Venue, **genre_filters))
+
+    city, state = request.args.get('city'), request.args.get('state')
+    data = venue_areas(city, state, criteria)
+    return render_template('pages/venues.html', areas=data, genre_filters=genre_filters,
+                           genres=genre_facets(venue_query(city, state, criteria), Venue, city=city, state=state,
+                                               **genre_filters),
+                           show_counts=request.args.get('counts', type=int))
+
+
+def search_query(model, search_term, criteria=()):
+    """Names matching search_term as a substring, a fuzzy trigram match or a
+    full-text word match, best first. Backed by the indexes from the
+    name_search_indexes migration.
+    """
+    escaped = search_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    document = func.to_tsvector('simple', func.coalesce(model.name, ''))
+    words = func.plainto_tsquery('simple', search_term)
+    score = func.greatest(func.similarity(model.name, search_term), func.ts_rank(document, words))
+    return db.session.query(model.id, model.name, func.count().over().label('total')). \
+        filter(or_(model.name.ilike('%{}%'.format(escaped), escape='\\'),
+                   model.name.op('%')(search_term),
+                   document.op('@@')(words)),
+               *criteria). \
+        order_by(score.desc(), model.id)
+
+
+def search_names(model, search_term, offset=0, criteria=()):
+    """Returns (count, rows, next_offset) for one page of search results."""
+    limit = current_app.config['SEARCH_RESULTS_LIMIT']
+    rows = search_query(model, search_term, criteria).offset(offset).limit(limit).all()
+    count = rows[0].total if rows else 0
+    next_offset = offset + limit if offset + limit < count else None
+    return count, [{'id': row.id, 'name': row.name} for row in rows], next_offset
+
+
+@route('/venues/search', methods=['POST'])
+@replica_reads
 def search_venues():
-    search_term = request.form.get('search_term')
-    results = Venue.query.filter(Venue.name.ilike('%{}%'.format(search_term)))
-    venue_list = list(results)
+    search_term = request.form.get('search_term', '')
+    criteria, genre_filters = genre_filter(Venue, request.form)
+    count, venue_list, next_offset = search_names(Venue, search_term, request.form.get('offset', 0, type=int),
+                                                  criteria)
     response = {
-        "count": len(venue_list),
-        "data": venue_list
+        "count": count,
+        "data": venue_list,
+        "next_offset": next_offset,
+        "genres": genre_facets(search_query(Venue, search_term, criteria), Venue, search_term=search_term,
+                               **genre_filters)
         }
 
-    return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+    return render_template('pages/search_venues.html', results=response, search_term=search_term,
+                           genre_filters=genre_filters)
+
+
+def load_with_shows(model, other, owner_key, other_key, entity_id):
+    """Load an entity, its show counts and its shows in a single statement.
+
+    Upcoming shows are read from the pre-joined UpcomingShow table; past
+    shows are joined from Show, and only the most recent PAST_SHOWS_LIMIT
+    of them are returned. Both counts cover every show and are taken from
+    Show, through its (owner, start_time) index, so that they agree with
+    each other whatever state UpcomingShow is in.
+    """
+    now = datetime.now()
+    show_fk, other_fk = getattr(Show, owner_key + '_id'), getattr(Show, other_key + '_id')
+    upcoming_fk = getattr(UpcomingShow, owner_key + '_id')
+    past = select(Show.start_time, other.id.label('other_id'), other.name.label('other_name'),
+                  other.image_link.label('other_image_link'), literal(True).label('is_past')). \
+        join(other, other.id == other_fk). \
+        where(show_fk == entity_id, Show.start_time < now). \
+        order_by(Show.start_time.desc()).limit(current_app.config['PAST_SHOWS_LIMIT']).subquery()
+    future = select(UpcomingShow.start_time, getattr(UpcomingShow, other_key + '_id'),
+                    getattr(UpcomingShow, other_key + '_name'), getattr(UpcomingShow, other_key + '_image_link'),
+                    literal(False)). \
+        where(upcoming_fk == entity_id, UpcomingShow.start_time >= now)
+    shows = union_all(select(past), future).subquery()
+    past_count = db.session.query(func.count(Show.id)). \
+        filter(show_fk == entity_id, Show.start_time < now).scalar_subquery()
+    upcoming_count = db.session.query(func.count(Show.id)). \
+        filter(show_fk == entity_id, Show.start_time >= now).scalar_subquery()
+    rows = db.session.query(model, past_count, upcoming_count, shows.c.start_time, shows.c.is_past,
+                            shows.c.other_id, shows.c.other_name, shows.c.other_image_link). \
+        outerjoin(shows, true()). \
+        filter(model.id == entity_id). \
+        order_by(shows.c.start_time.desc()).all()
+    if not rows:
+        abort(404)
+
+    entity, past_shows_count, upcoming_shows_count = rows[0][:3]
+    past_shows = []
+    upcoming_shows = []
+    for row in rows:
+        start_time, show_is_past, other_id, other_name, other_image_link = row[3:]
+        if start_time is None:
+            continue
+        show = (other_id, other_name, other_image_link, start_time)
+        (past_shows if show_is_past else upcoming_shows).append(show)
+    upcoming_shows.reverse()
+    return entity, past_shows_count, upcoming_shows_count, past_shows, upcoming_shows
+
+
+def venue_detail(venue_id):
+    v, past_shows_count, upcoming_shows_count, past_shows, upcoming_shows = \
+        load_with_shows(Venue, Artist, 'venue', 'artist', venue_id)
+    data = {
+        'id': v.id,
+        'name': v.name,
+        'genres': v.genres,
+        'address': v.address,
+        'city': v.city,
+        'state': v.state,
+        'phone': v.phone,
+        'website': v.website,
+        'facebook_link': v.facebook_link,
+        'seeking_talent': v.seeking_talent,
+        'seeking_description': v.seeking_description,
+        'image_link': v.image_link,
+        'upcoming_shows_count': upcoming_shows_count,
+        'past_shows_count': past_shows_count,
+        'past_shows': [{
+            'artist_id': artist_id,
+            'artist_name': artist_name,
+            'artist_image_link': artist_image_link,
+            'start_time': start_time,
+        } for artist_id, artist_name, artist_image_link, start_time in past_shows],
+        'upcoming_shows': [{
+            'artist_id': artist_id,
+            'artist_name': artist_name,
+            'artist_image_link': artist_image_link,
+            'start_time': start_time,
+        } for artist_id, artist_name, artist_image_link, start_time in upcoming_shows]
+    }
+    return data
 
 
-@app.route('/venues/<int:venue_id>')
+@route('/venues/<int:venue_id>')
+@page_cache.cached('venue:{venue_id}')
+@replica_reads
 def show_venue(venue_id):
-    venue = db.session.query(Venue).filter(Venue.id == venue_id)
-    past_shows_result = db.session.query(Show).join(Artist).join(Venue). \
-        filter(Show.venue_id == venue_id).filter(
-        Show.start_time < datetime.now()).all()
-    upcoming_shows_result = db.session.query(Show).join(Artist).join(Venue).filter \
-        (Show.venue_id == venue_id).filter(Show.start_time > datetime.now()).all()
-    for v in venue:
-        past_shows = []
-        upcoming_shows = []
-        data = {
-            'id': v.id,
-            'name': v.name,
-            'genres': v.genres,
-            'address': v.address,
-            'city': v.city,
-            'state': v.state,
-            'phone': v.phone,
-            'website': v.website,
-            'facebook_link': v.facebook_link,
-            'seeking_talent': v.seeking_talent,
-            'seeking_description': v.seeking_description,
-            'image_link': v.image_link,
-            'upcoming_shows_count': len(upcoming_shows_result),
-            'past_shows_count': len(past_shows_result),
-            'past_shows': past_shows,
-            'upcoming_shows': upcoming_shows
-        }
-        for show in past_shows_result:
-            past_shows.append({
-                'artist_id': show.Artist.id,
-                'artist_name': show.Artist.name,
-                'artist_image_link': show.Artist.image_link,
-                'start_time': show.start_time.strftime("%m-%d-%Y %H:%M:%S"),
-            })
-        for show in upcoming_shows_result:
-            upcoming_shows.append({
-                'artist_id': show.Artist.id,
-                'artist_name': show.Artist.name,
-                'artist_image_link': show.Artist.image_link,
-                'start_time': show.start_time.strftime("%m-%d-%Y %H:%M:%S"),
-            })
-        return render_template('pages/show_venue.html', venue=data)
+    venue = venue_detail(venue_id)
+    with_start_times(venue['past_shows'] + venue['upcoming_shows'])
+    return render_template('pages/show_venue.html', venue=venue)
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
 
-@app.route('/venues/create', methods=['GET'])
+@route('/venues/create', methods=['GET'])
 def create_venue_form():
     form = VenueForm()
     return render_template('forms/new_venue.html', form=form)
 
 
-@app.route('/venues/create', methods=['POST'])
+@route('/venues/create', methods=['POST'])
 def create_venue_submission():
     error = False
     try:
@@ -217,7 +460,10 @@ def create_venue_submission():
                           genres=genres, seeking_talent=seeking_talent, seeking_description=seeking_description,
                           website=website, image_link=image_link, facebook_link=facebook_link)
         db.session.add(new_venue)
+        db.session.flush()
+        dashboard.count_rows(Venue, Venue.id == new_venue.id)
         db.session.commit()
+        page_cache.invalidate('venues')
         flash('Venue ' + request.form['name'] + ' was successfully listed!')
     except():
         db.session.rollback()
@@ -231,13 +477,11 @@ def create_venue_submission():
     return render_template('pages/home.html')
 
 
-@app.route('/venues/<int:venue_id>', methods=['POST'])
+@route('/venues/<int:venue_id>', methods=['POST'])
 def delete_venue(venue_id):
     try:
-        venue = Venue.query.filter_by(id=venue_id).first_or_404()
-        current_session = db.object_session(venue)
-        current_session.delete(venue)
-        current_session.commit()
+        if not purge.delete_rows('venues', ids=[venue_id])['deleted']:
+            abort(404)
         flash('The venue has been removed together with all of its shows.')
         return render_template('pages/home.html')
     except ValueError:
@@ -249,82 +493,123 @@ def delete_venue(venue_id):
 #  ----------------------------------------------------------------
 
 
-@app.route('/artists')
+def artist_letters(criteria=(), genre_filters=None):
+    # Jump index: count per first letter of the artists the genre filters
+    # match, recomputed only after an artist write invalidates the 'artists'
+    # tag.
+    def compute():
+        letter = func.upper(func.left(Artist.name, 1))
+        counts = {}
+        for first, count in db.session.query(letter, func.count(Artist.id)).filter(*criteria).group_by(letter):
+            key = first if first and first.isalpha() else '#'
+            counts[key] = counts.get(key, 0) + count
+        return sorted(counts.items())
+    return page_cache.remember('artist-letters?' + urlencode(sorted((genre_filters or {}).items()), doseq=True),
+                               ['artists'], compute)
+
+
+def artists_page_query(args, criteria=()):
+    # One row more than a page, to tell whether there is a next page.
+    query = db.session.query(Artist.id, Artist.name).filter(*criteria)
+    if args.get('after'):
+        after_name, after_id = parse_cursor(args['after'], str)
+        query = query.filter(tuple_(Artist.name, Artist.id) > tuple_(after_name, after_id))
+    elif args.get('letter', '').isalpha():
+        # Names starting with the letter in either case: a range on name,
+        # from whichever case the collation sorts first, which
+        # ix_Artist_name_id serves in order.
+        letter = args['letter']
+        query = query.filter(Artist.name >= func.least(letter.upper(), letter.lower()))
+    return query.order_by(Artist.name, Artist.id).limit(current_app.config['ARTISTS_PER_PAGE'] + 1)
+
+
+def artists_page(query):
+    per_page = current_app.config['ARTISTS_PER_PAGE']
+    rows = query.all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = '{},{}'.format(rows[-1].name, rows[-1].id)
+    return [{'id': row.id, 'name': row.name} for row in rows], next_cursor
+
+
+@route('/artists')
+@page_cache.cached('artists')
+@replica_reads
 def artists():
-    artists = Artist.query.all()
-    data = []
-    for artist in artists:
-        data.append({
-            'id': artist.id,
-            'name': artist.name})
-    return render_template('pages/artists.html', artists=data)
+    criteria, genre_filters = genre_filter(Artist, request.args)
+    data, next_cursor = artists_page(artists_page_query(request.args, criteria))
+    return render_template('pages/artists.html', artists=data, letters=artist_letters(criteria, genre_filters),
+                           next_cursor=next_cursor, genre_filters=genre_filters,
+                           genres=genre_facets(db.session.query(Artist.id).filter(*criteria), Artist,
+                                               **genre_filters))
 
 
-@app.route('/artists/search', methods=['POST'])
+@route('/artists/search', methods=['POST'])
+@replica_reads
 def search_artists():
-    search_term = request.form.get('search_term')
-    results = Artist.query.filter(Artist.name.ilike('%{}%'.format(search_term)))
-    artist_list = list(results)
+    search_term = request.form.get('search_term', '')
+    criteria, genre_filters = genre_filter(Artist, request.form)
+    count, artist_list, next_offset = search_names(Artist, search_term, request.form.get('offset', 0, type=int),
+                                                   criteria)
     response = {
-      "count": len(artist_list),
-      "data": artist_list
+      "count": count,
+      "data": artist_list,
+      "next_offset": next_offset,
+      "genres": genre_facets(search_query(Artist, search_term, criteria), Artist, search_term=search_term,
+                             **genre_filters)
+    }
+    return render_template('pages/search_artists.html', results=response, search_term=search_term,
+                           genre_filters=genre_filters)
+
+
+def artist_detail(artist_id):
+    a, past_shows_count, upcoming_shows_count, past_shows, upcoming_shows = \
+        load_with_shows(Artist, Venue, 'artist', 'venue', artist_id)
+    data = {
+        'id': a.id,
+        'name': a.name,
+        'genres': a.genres,
+        'city': a.city,
+        'state': a.state,
+        'phone': a.phone,
+        'website': a.website,
+        'facebook_link': a.facebook_link,
+        'seeking_venue': a.seeking_venue,
+        'seeking_description': a.seeking_description,
+        'image_link': a.image_link,
+        'upcoming_shows_count': upcoming_shows_count,
+        'past_shows_count': past_shows_count,
+        'past_shows': [{
+            'venue_id': venue_id,
+            'venue_name': venue_name,
+            'venue_image_link': venue_image_link,
+            'start_time': start_time,
+        } for venue_id, venue_name, venue_image_link, start_time in past_shows],
+        'upcoming_shows': [{
+            'venue_id': venue_id,
+            'venue_name': venue_name,
+            'venue_image_link': venue_image_link,
+            'start_time': start_time,
+        } for venue_id, venue_name, venue_image_link, start_time in upcoming_shows]
     }
-    return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+    return data
 
 
-@app.route('/artists/<int:artist_id>')
+@route('/artists/<int:artist_id>')
+@page_cache.cached('artist:{artist_id}')
+@replica_reads
 def show_artist(artist_id):
-    artist = db.session.query(Artist).filter(Artist.id == artist_id)
-    past_shows_result = db.session.query(Show).join(Artist).join(Venue).\
-        filter(Show.artist_id == artist_id).filter(
-      Show.start_time < datetime.now()).all()
-    upcoming_shows_result = db.session.query(Show).join(Artist).join(Venue).filter\
-        (Show.artist_id == artist_id).filter(Show.start_time > datetime.now()).all()
-    for a in artist:
-        past_shows = []
-        upcoming_shows = []
-        data = {
-            'id': a.id,
-            'name': a.name,
-            'genres': a.genres,
-            'city': a.city,
-            'state': a.state,
-            'phone': a.phone,
-            'website': a.website,
-            'facebook_link': a.facebook_link,
-            'seeking_venue': a.seeking_venue,
-            'seeking_description': a.seeking_description,
-            'image_link': a.image_link,
-            'upcoming_shows_count': len(upcoming_shows_result),
-            'past_shows_count': len(past_shows_result),
-            'past_shows': past_shows,
-            'upcoming_shows': upcoming_shows
-        }
-        for show in past_shows_result:
-            past_shows.append({
-                'venue_id': show.Venue.id,
-                'venue_name': show.Venue.name,
-                'venue_image_link': show.Venue.image_link,
-                'start_time': show.start_time.strftime("%m-%d-%Y %H:%M:%S"),
-            })
-        for show in upcoming_shows_result:
-            upcoming_shows.append({
-                'venue_id': show.Venue.id,
-                'venue_name': show.Venue.name,
-                'venue_image_link': show.Venue.image_link,
-                'start_time': show.start_time.strftime("%m-%d-%Y %H:%M:%S"),
-            })
-
-    return render_template('pages/show_artist.html', artist=data)
-
-
-@app.route('/artist/<int:artist_id>', methods=['POST'])
+    artist = artist_detail(artist_id)
+    with_start_times(artist['past_shows'] + artist['upcoming_shows'])
+    return render_template('pages/show_artist.html', artist=artist)
+
+
+@route('/artist/<int:artist_id>', methods=['POST'])
 def delete_artist(artist_id):
     try:
-        artist = Artist.query.filter_by(id=artist_id).first_or_404()
-        current_session = db.object_session(artist)
-        current_session.delete(artist)
-        current_session.commit()
+        if not purge.delete_rows('artists', ids=[artist_id])['deleted']:
+            abort(404)
         flash('The artist has been removed together with all of its shows.')
         return render_template('pages/home.html')
     except ValueError:
@@ -334,13 +619,13 @@ def delete_artist(artist_id):
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@route('/artists/create', methods=['GET'])
 def create_artist_form():
   form = ArtistForm()
   return render_template('forms/new_artist.html', form=form)
 
 
-@app.route('/artists/create', methods=['POST'])
+@route('/artists/create', methods=['POST'])
 def create_artist_submission():
     error = False
     try:
@@ -361,7 +646,10 @@ def create_artist_submission():
                         genres=genres, seeking_venue=seeking_venue, seeking_description=seeking_description,
                         website=website, image_link=image_link, facebook_link=facebook_link)
         db.session.add(new_artist)
+        db.session.flush()
+        dashboard.count_rows(Artist, Artist.id == new_artist.id)
         db.session.commit()
+        page_cache.invalidate('artists')
         flash('Artist ' + request.form['name'] + ' was successfully listed!')
     except():
         db.session.rollback()
@@ -375,18 +663,33 @@ def create_artist_submission():
     return render_template('pages/home.html')
 
 #  Update Artist--------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+
+def attributes_changed(instance, *names):
+    # Assigning an attribute its current value leaves no history, so this
+    # is also what keeps unchanged columns out of the UPDATE.
+    state = db.inspect(instance)
+    return any(state.attrs[name].history.has_changes() for name in names)
+
+
+def check_version(instance):
+    """Raises StaleDataError if the form was rendered from an older version."""
+    if request.form.get('version', instance.version, type=int) != instance.version:
+        raise StaleDataError('{} {} was changed since the form was loaded'.format(
+            type(instance).__name__, instance.id))
+
+@route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
     artist = Artist.query.get(artist_id)
     form = ArtistForm(obj=artist)
     return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
-    artist = Artist.query.get(artist_id)
+    artist = Artist.query.get_or_404(artist_id)
     error = False
     try:
+        check_version(artist)
         artist.name = request.form['name']
         artist.city = request.form['city']
         artist.state = request.form['state']
@@ -400,14 +703,23 @@ def edit_artist_submission(artist_id):
         artist.website = request.form['website']
         artist.image_link = request.form['image_link']
         artist.facebook_link = request.form['facebook_link']
-        updated_artist = Artist(name=artist.name, city=artist.city, state=artist.state,
-                                phone=artist.phone,
-                                genres=artist.genres, seeking_venue=artist.seeking_venue,
-                                seeking_description=artist.seeking_description, website=artist.website,
-                                image_link=artist.image_link, facebook_link=artist.facebook_link)
-        db.session.add(updated_artist)
+        # Both checks come first: move_city() flushes, which clears the
+        # history they read.
+        city_changed = attributes_changed(artist, 'city', 'state')
+        listing_changed = attributes_changed(artist, 'name', 'image_link')
+        if city_changed:
+            dashboard.move_city(Artist, artist_id)
+        if listing_changed:
+            upcoming.refresh_artist(artist)
         db.session.commit()
+        page_cache.invalidate(*artist_cache_tags(artist_id))
         flash('Artist ' + request.form['name'] + ' was successfully updated')
+    except StaleDataError:
+        db.session.rollback()
+        flash('Artist ' + request.form['name'] + ' was changed by someone else in the meantime. '
+              'Review the current details and submit your changes again.')
+        artist = Artist.query.get_or_404(artist_id)
+        return render_template('forms/edit_artist.html', form=ArtistForm(obj=artist), artist=artist), 409
     except():
         db.session.rollback()
         error = True
@@ -421,18 +733,19 @@ def edit_artist_submission(artist_id):
 
 #  Update Venue--------------------------------------------------------
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
     venue = Venue.query.get(venue_id)
     form = VenueForm(obj=venue)
     return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
-    venue = Venue.query.get(venue_id)
+    venue = Venue.query.get_or_404(venue_id)
     error = False
     try:
+        check_version(venue)
         venue.name = request.form['name']
         venue.city = request.form['city']
         venue.state = request.form['state']
@@ -447,12 +760,23 @@ def edit_venue_submission(venue_id):
         venue.website = request.form['website']
         venue.image_link = request.form['image_link']
         venue.facebook_link = request.form['facebook_link']
-        updated_venue = Venue(name=venue.name, city=venue.city, state=venue.state, address=venue.address, phone=venue.phone,
-                        genres=venue.genres, seeking_talent=venue.seeking_talent, seeking_description=venue.seeking_description,
-                        website=venue.website, image_link=venue.image_link, facebook_link=venue.facebook_link)
-        db.session.add(updated_venue)
+        # Both checks come first: move_city() flushes, which clears the
+        # history they read.
+        city_changed = attributes_changed(venue, 'city', 'state')
+        listing_changed = city_changed or attributes_changed(venue, 'name', 'image_link')
+        if city_changed:
+            dashboard.move_city(Venue, venue_id)
+        if listing_changed:
+            upcoming.refresh_venue(venue)
         db.session.commit()
+        page_cache.invalidate(*venue_cache_tags(venue_id))
         flash('Venue ' + request.form['name'] + ' was successfully updated')
+    except StaleDataError:
+        db.session.rollback()
+        flash('Venue ' + request.form['name'] + ' was changed by someone else in the meantime. '
+              'Review the current details and submit your changes again.')
+        venue = Venue.query.get_or_404(venue_id)
+        return render_template('forms/edit_venue.html', form=VenueForm(obj=venue), venue=venue), 409
     except():
         db.session.rollback()
         error = True
@@ -467,41 +791,118 @@ def edit_venue_submission(venue_id):
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+def shows_page_query(args):
+    """Returns the query for one page of shows (plus one row), the filters
+    applied and the (id, updated_at...) columns the API versions it by.
+
+    A page that starts at or after the current time is read from
+    UpcomingShow; pages that reach into the past join Show, Venue and Artist.
+    """
+    filters = {key: args[key] for key in ('from', 'to', 'city', 'genre') if args.get(key)}
+    try:
+        start = datetime.strptime(filters['from'], '%Y-%m-%d') if 'from' in filters else None
+        end = datetime.strptime(filters['to'], '%Y-%m-%d') + timedelta(days=1) if 'to' in filters else None
+    except ValueError:
+        abort(400)
+    after = parse_cursor(args['after'], datetime.fromisoformat) if args.get('after') else None
+
+    lower_bounds = [bound for bound in (start, after and after[0]) if bound is not None]
+    if lower_bounds and max(lower_bounds) >= datetime.now():
+        query = db.session.query(UpcomingShow.show_id.label('id'), UpcomingShow.start_time, UpcomingShow.venue_id,
+                                 UpcomingShow.venue_name, UpcomingShow.artist_id, UpcomingShow.artist_name,
+                                 UpcomingShow.artist_image_link)
+        show_id, start_time, city = UpcomingShow.show_id, UpcomingShow.start_time, UpcomingShow.city
+        versioned = (UpcomingShow.show_id, UpcomingShow.updated_at)
+        if 'genre' in filters:
+            query = query.join(Artist, Artist.id == UpcomingShow.artist_id)
+    else:
+        query = db.session.query(Show.id, Show.start_time, Show.venue_id, Venue.name.label('venue_name'),
+                                 Show.artist_id, Artist.name.label('artist_name'),
+                                 Artist.image_link.label('artist_image_link')). \
+            join(Venue, Venue.id == Show.venue_id).join(Artist, Artist.id == Show.artist_id)
+        show_id, start_time, city = Show.id, Show.start_time, Venue.city
+        versioned = (Show.id, Show.updated_at, Venue.updated_at, Artist.updated_at)
+
+    if start is not None:
+        query = query.filter(start_time >= start)
+    if end is not None:
+        query = query.filter(start_time < end)
+    if 'city' in filters:
+        query = query.filter(city == filters['city'])
+    if 'genre' in filters:
+        query = query.filter(Artist.genres.contains([filters['genre']]))
+    if after is not None:
+        query = query.filter(tuple_(start_time, show_id) > tuple_(*after))
+    return query.order_by(start_time.asc(), show_id.asc()).limit(current_app.config['SHOWS_PER_PAGE'] + 1), filters, versioned
+
+
+def shows_page(query):
+    per_page = current_app.config['SHOWS_PER_PAGE']
+    rows = query.all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = '{},{}'.format(rows[-1].start_time.isoformat(), rows[-1].id)
+
+    data = [{
+        "venue_id": row.venue_id,
+        "venue_name": row.venue_name,
+        "artist_id": row.artist_id,
+        "artist_name": row.artist_name,
+        "artist_image_link": row.artist_image_link,
+        "start_time": row.start_time
+    } for row in rows]
+    return data, next_cursor
+
+
+@route('/shows')
+@page_cache.cached('shows')
+@replica_reads
 def shows():
-    data = []
-    shows = Show.query.order_by(Show.start_time.asc()).all()
-    for show in shows:
-        venue = Venue.query.filter_by(id=show.venue_id).first_or_404()
-        artist = Artist.query.filter_by(id=show.artist_id).first_or_404()
-        data.extend([{
-            "venue_id": venue.id,
-            "venue_name": venue.name,
-            "artist_id": artist.id,
-            "artist_name": artist.name,
-            "artist_image_link": artist.image_link,
-            "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M")
-            }])
-    return render_template('pages/shows.html', shows=data)
-
-
-@app.route('/shows/create')
+    query, filters, _ = shows_page_query(request.args)
+    data, next_cursor = shows_page(query)
+    return render_template('pages/shows.html', shows=with_start_times(data), filters=filters,
+                           next_cursor=next_cursor)
+
+
+@route('/shows/create')
 def create_shows():
     form = ShowForm()
     return render_template('forms/new_show.html', form=form)
 
 
-@app.route('/shows/create', methods=['POST'])
+@route('/shows/create', methods=['POST'])
 def create_show_submission():
+    form = ShowForm(request.form)
+    if not form.validate():
+        for field, messages in form.errors.items():
+            flash('Show could not be listed: {} {}'.format(field.replace('_', ' '), ' '.join(messages)))
+        return render_template('forms/new_show.html', form=form), 400
     error = False
     try:
-        artist_id = request.form['artist_id']
-        venue_id = request.form['venue_id']
-        start_time = request.form['start_time']
-        new_show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time,)
+        artist_id = form.artist_id.data
+        venue_id = form.venue_id.data
+        new_show = Show(artist_id=artist_id, venue_id=venue_id, start_time=form.start_time.data,
+                        duration_minutes=form.duration_minutes.data or 120)
         db.session.add(new_show)
+        db.session.flush()
+        upcoming.add_shows(Show.id == new_show.id)
+        dashboard.count_rows(Show, Show.id == new_show.id)
         db.session.commit()
+        page_cache.invalidate('shows', 'venue:{}'.format(venue_id), 'artist:{}'.format(artist_id))
         flash('Show was successfully listed!')
+    except IntegrityError as e:
+        db.session.rollback()
+        pgcode = getattr(e.orig, 'pgcode', None)
+        if pgcode == errorcodes.FOREIGN_KEY_VIOLATION:
+            missing = 'artist' if 'artist_id' in (e.orig.diag.constraint_name or '') else 'venue'
+            flash('There is no {} with that id. Show could not be listed.'.format(missing))
+            return render_template('forms/new_show.html', form=form), 400
+        if pgcode != errorcodes.EXCLUSION_VIOLATION:
+            raise
+        booked = 'artist' if e.orig.diag.constraint_name == 'ex_Show_artist_during' else 'venue'
+        flash('The {} is already booked at that time. Show could not be listed.'.format(booked))
+        return render_template('forms/new_show.html', form=form), 409
     except():
         db.session.rollback()
         error = True
@@ -514,37 +915,286 @@ def create_show_submission():
     return render_template('pages/home.html')
 
 
-@app.errorhandler(404)
+#  API
+#  ----------------------------------------------------------------
+#  Read-only JSON versions of the pages above. Each endpoint first runs a
+#  cheap version query over the rows its payload is built from (count, id
+#  sum and newest updated_at); the ETag is derived from it, so a matching
+#  If-None-Match is answered with 304 before the payload is assembled.
+
+def page_version(query, *columns):
+    # columns: the id column first, then updated_at columns
+    page = query.with_entities(*columns).subquery()
+    page_columns = list(page.c)
+    return db.session.query(func.count(), func.sum(page_columns[0]),
+                            *[func.max(column) for column in page_columns[1:]]).one()
+
+
+def detail_version(model, show_fk, other, other_fk, entity_id):
+    # The next upcoming start time is part of the version because the
+    # past/upcoming split moves when it passes.
+    now = datetime.now()
+    version = db.session.query(model.updated_at, func.count(Show.id), func.max(Show.updated_at),
+                               func.max(other.updated_at),
+                               func.min(Show.start_time).filter(Show.start_time >= now)). \
+        select_from(model).outerjoin(Show, show_fk == model.id).outerjoin(other, other.id == other_fk). \
+        filter(model.id == entity_id).group_by(model.id).first()
+    if version is None:
+        abort(404)
+    return version
+
+
+def api_response(version, build):
+    etag = hashlib.sha1(repr((request.full_path, tuple(version))).encode()).hexdigest()
+    # Weak comparison: compressed responses carry the ETag as W/"...".
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        payload = build()
+        payload['success'] = True
+        response = Response(json.dumps(payload, default=exporter.to_json), mimetype='application/json')
+    response.set_etag(etag)
+    return response
+
+
+@route('/api/v1/venues')
+@replica_reads
+def api_venues():
+    city, state = request.args.get('city'), request.args.get('state')
+    criteria, genre_filters = genre_filter(Venue, request.args)
+    query = venue_query(city, state, criteria)
+    version = page_version(query, Venue.id, Venue.updated_at)
+    return api_response(version, lambda: {'areas': venue_areas(city, state, criteria),
+                                          'genres': genre_facets(query, Venue, city=city, state=state,
+                                                                 **genre_filters)})
+
+
+@route('/api/v1/venues/<int:venue_id>')
+@replica_reads
+def api_venue(venue_id):
+    version = detail_version(Venue, Show.venue_id, Artist, Show.artist_id, venue_id)
+    return api_response(version, lambda: {'venue': venue_detail(venue_id)})
+
+
+@route('/api/v1/artists')
+@replica_reads
+def api_artists():
+    criteria, genre_filters = genre_filter(Artist, request.args)
+    matching = db.session.query(Artist.id).filter(*criteria)
+    # Versioned over every matching artist, not just the page, as the genre
+    # counts cover all of them.
+    version = page_version(matching, Artist.id, Artist.updated_at)
+
+    def build():
+        data, next_cursor = artists_page(artists_page_query(request.args, criteria))
+        return {'artists': data, 'next_cursor': next_cursor,
+                'genres': genre_facets(matching, Artist, **genre_filters)}
+    return api_response(version, build)
+
+
+@route('/api/v1/artists/<int:artist_id>')
+@replica_reads
+def api_artist(artist_id):
+    version = detail_version(Artist, Show.artist_id, Venue, Show.venue_id, artist_id)
+    return api_response(version, lambda: {'artist': artist_detail(artist_id)})
+
+
+@route('/api/v1/shows')
+@replica_reads
+def api_shows():
+    query, filters, versioned = shows_page_query(request.args)
+    version = page_version(query, *versioned)
+
+    def build():
+        data, next_cursor = shows_page(query)
+        return {'shows': data, 'next_cursor': next_cursor}
+    return api_response(version, build)
+
+
+@route('/api/v1/search/<entity>')
+@replica_reads
+def api_search(entity):
+    models = {'venues': Venue, 'artists': Artist}
+    if entity not in models:
+        abort(404)
+    model = models[entity]
+    search_term = request.args.get('search_term', '')
+    offset = request.args.get('offset', 0, type=int)
+    criteria, genre_filters = genre_filter(model, request.args)
+    query = search_query(model, search_term, criteria)
+    version = page_version(query, model.id, model.updated_at)
+
+    def build():
+        count, data, next_offset = search_names(model, search_term, offset, criteria)
+        return {'count': count, 'data': data, 'next_offset': next_offset,
+                'genres': genre_facets(query, model, search_term=search_term, **genre_filters)}
+    return api_response(version, build)
+
+
+def availability_conflicts(slots):
+    """Booked shows overlapping any of slots, (index, artist_id, venue_id,
+    start, end) tuples, as (index, 'artist' or 'venue', show row) pairs.
+
+    One statement: the slots are sent as a VALUES list and joined to Show
+    once per side, each join served by its exclusion constraint's index.
+    """
+    candidates = values(column('slot', Integer), column('artist_id', Integer), column('venue_id', Integer),
+                        column('start_time', DateTime), column('end_time', DateTime),
+                        name='candidates').data(slots)
+    during = func.tsrange(candidates.c.start_time, candidates.c.end_time)
+    clashes = [
+        select(candidates.c.slot, literal(side).label('side'), Show.id, Show.artist_id, Show.venue_id,
+               Show.start_time, func.upper(Show.during).label('end_time')).
+        select_from(candidates).
+        join(Show, and_(show_fk == candidate_fk, Show.during.overlaps(during)))
+        for side, show_fk, candidate_fk in (('artist', Show.artist_id, candidates.c.artist_id),
+                                            ('venue', Show.venue_id, candidates.c.venue_id))
+    ]
+    query = union_all(*clashes).order_by('slot', 'start_time')
+    return [(row.slot, row.side, row) for row in db.session.execute(query)]
+
+
+@route('/api/v1/availability', methods=['POST'])
+def api_availability():
+    """Check many candidate slots against the booked shows in one round trip.
+
+    Body: {"slots": [{"artist_id": 1, "venue_id": 2, "start_time": "2030-05-01T20:00:00",
+                      "duration_minutes": 120}, ...]}
+    Slots are not checked against each other. Always reads the primary.
+    """
+    slots = (request.get_json(silent=True) or {}).get('slots')
+    if not isinstance(slots, list) or len(slots) > current_app.config['AVAILABILITY_MAX_SLOTS']:
+        abort(400)
+    rows = []
+    try:
+        for index, slot in enumerate(slots):
+            start = datetime.fromisoformat(slot['start_time'])
+            duration = int(slot.get('duration_minutes', 120))
+            artist_id, venue_id = slot.get('artist_id'), slot.get('venue_id')
+            artist_id, venue_id = artist_id and int(artist_id), venue_id and int(venue_id)
+            # The same bounds as ShowForm; Postgres rejects an empty or
+            # reversed range and ids past int4.
+            if not 1 <= duration <= MAX_DURATION_MINUTES or \
+                    any(row_id is not None and not 0 <= row_id <= MAX_ID for row_id in (artist_id, venue_id)):
+                abort(400)
+            rows.append((index, artist_id, venue_id, start, start + timedelta(minutes=duration)))
+    except (KeyError, TypeError, ValueError, AttributeError):
+        abort(400)
+
+    results = [dict(slot, available=True, conflicts=[]) for slot in slots]
+    for index, side, show in availability_conflicts(rows) if rows else []:
+        results[index]['available'] = False
+        results[index]['conflicts'].append({
+            'booked': side,
+            'show_id': show.id,
+            'artist_id': show.artist_id,
+            'venue_id': show.venue_id,
+            'start_time': show.start_time,
+            'end_time': show.end_time,
+        })
+    return Response(json.dumps({'slots': results, 'success': True}, default=exporter.to_json),
+                    mimetype='application/json')
+
+
+@route('/api/v1/<entity>/delete', methods=['POST'])
+def api_bulk_delete(entity):
+    """Delete many venues or artists, and by cascade their shows.
+
+    Body: {"ids": [1, 2, 3]}. Unknown ids are ignored; the response says how
+    many rows went. The request must carry "Authorization: Bearer <token>"
+    with the BULK_DELETE_TOKEN from the config; without one configured the
+    endpoint is off and "flask purge-catalogue" is the only way.
+    """
+    token = current_app.config.get('BULK_DELETE_TOKEN')
+    if entity not in purge.ENTITIES or not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), 'Bearer {}'.format(token).encode()):
+        abort(401)
+    ids = (request.get_json(silent=True) or {}).get('ids')
+    if not isinstance(ids, list) or len(ids) > current_app.config['BULK_DELETE_MAX_IDS']:
+        abort(400)
+    try:
+        ids = [int(row_id) for row_id in ids]
+    except (TypeError, ValueError):
+        abort(400)
+    report = purge.delete_rows(entity, ids=ids, batch_size=current_app.config['BULK_DELETE_BATCH_SIZE'])
+    return jsonify({'deleted': report['deleted'], 'shows_deleted': report['shows_deleted'], 'success': True})
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+@route('/export/<entity>.<fmt>')
+def export_catalogue(entity, fmt):
+    if entity not in exporter.ENTITIES or fmt not in exporter.FORMATS:
+        abort(404)
+    try:
+        chunks = exporter.export(entity, fmt,
+                                 updated_since=exporter.parse_filter_date(request.args.get('updated_since')),
+                                 start=exporter.parse_filter_date(request.args.get('from')),
+                                 end=exporter.parse_end_date(request.args.get('to')))
+    except ValueError:
+        abort(400)
+    response = Response(stream_with_context(chunks), mimetype=exporter.FORMATS[fmt])
+    response.headers['Content-Disposition'] = 'attachment; filename={}.{}'.format(entity, fmt)
+    return response
+
+
+#  Stats
+#  ----------------------------------------------------------------
+
+@stats_route('/_stats/cache')
+def cache_stats():
+    return jsonify(page_cache.stats())
+
+
+@stats_route('/_stats/logging')
+def logging_stats():
+    return jsonify(queue_logging.stats())
+
+
+@stats_route('/_stats/pool')
+def pool_stats():
+    return jsonify({key or 'primary': pool_metrics.pool_report(engine) for key, engine in db.engines.items()})
+
+
+@errorhandler(400)
+def bad_request_error(error):
+    if request.path.startswith('/api/'):
+        return jsonify({"success": False, "error": 400, "message": "bad request"}), 400
+    return error
+
+
+@errorhandler(401)
+def unauthorized_error(error):
+    if request.path.startswith('/api/'):
+        return jsonify({"success": False, "error": 401, "message": "unauthorized"}), 401
+    return error
+
+
+@errorhandler(404)
 def not_found_error(error):
+    if request.path.startswith('/api/'):
+        return jsonify({"success": False, "error": 404, "message": "resource not found"}), 404
     return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
+@errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
-
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
\ No newline at end of file
@@ -0,0 +1,182 @@
+#----------------------------------------------------------------------------#
+# Fingerprinted, precompressed static assets.
+#
+#   $ flask build-assets
+#   assets = Assets(app)
+#
+# The build copies every file under static/ to static/dist/ with a content
+# hash in its name (css/main.css -> css/main.1a2b3c4d5e.css), rewriting the
+# url(...) references in stylesheets to the hashed names, and writes .gz and,
+# with the brotli package installed, .br versions of the text formats next
+# to them. static/dist/manifest.json maps the original names to the hashed
+# ones.
+#
+# At runtime url_for('static', filename='css/main.css') then points at the
+# hashed file, which is served with a far-future immutable Cache-Control and
+# in the best encoding the client accepts. Without a build (or for files
+# that are not in the manifest) Flask's own static view is used unchanged.
+# The manifest is read at startup, so restart the workers after a build.
+#----------------------------------------------------------------------------#
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+import click
+from flask import abort, current_app, request, send_from_directory
+from flask.cli import with_appcontext
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.eot', '.ttf', '.otf', '.ico'}
+# Preferred first.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+?)\1\s*\)''')
+URL_SUFFIX = re.compile(r'([^?#]*)(.*)')
+
+
+def fingerprint(relative_path, content):
+    stem, ext = posixpath.splitext(relative_path)
+    return '{}.{}{}'.format(stem, hashlib.sha256(content).hexdigest()[:10], ext)
+
+
+def rewrite_css(relative_path, content, assets):
+    # Relative url()s are resolved against the stylesheet; anything not built
+    # (absolute URLs, data: URIs, missing files) is left as it is.
+    directory = posixpath.dirname(relative_path)
+
+    def replace(match):
+        quote, url = match.groups()
+        target, suffix = URL_SUFFIX.match(url).groups()
+        resolved = posixpath.normpath(posixpath.join(directory, target))
+        if ':' in target or target.startswith('/') or resolved not in assets:
+            return match.group(0)
+        hashed = posixpath.relpath(assets[resolved], directory)
+        return 'url({0}{1}{2}{0})'.format(quote, hashed, suffix)
+
+    return CSS_URL.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+
+def compress(path, content, brotli):
+    written = []
+    compressed = gzip.compress(content, compresslevel=9, mtime=0)
+    if len(compressed) < len(content):
+        with open(path + '.gz', 'wb') as f:
+            f.write(compressed)
+        written.append('gzip')
+    if brotli is not None:
+        compressed = brotli.compress(content, quality=11)
+        if len(compressed) < len(content):
+            with open(path + '.br', 'wb') as f:
+                f.write(compressed)
+            written.append('br')
+    return written
+
+
+def build(static_folder, clean=False, echo=print):
+    """Fingerprint and compress the files under static_folder; returns the manifest."""
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        echo('brotli is not installed; writing gzip files only.')
+    dist = os.path.join(static_folder, DIST)
+    if clean and os.path.isdir(dist):
+        shutil.rmtree(dist)
+
+    sources = []
+    for directory, subdirectories, files in os.walk(static_folder):
+        if directory == static_folder and DIST in subdirectories:
+            subdirectories.remove(DIST)
+        for name in files:
+            sources.append(posixpath.join(*os.path.relpath(os.path.join(directory, name), static_folder).split(os.sep)))
+    # Stylesheets last, so that what they reference has been hashed already.
+    sources.sort(key=lambda relative_path: (relative_path.endswith('.css'), relative_path))
+
+    manifest = {'assets': {}, 'encodings': {}}
+    for relative_path in sources:
+        with open(os.path.join(static_folder, relative_path), 'rb') as f:
+            content = f.read()
+        if relative_path.endswith('.css'):
+            content = rewrite_css(relative_path, content, manifest['assets'])
+        hashed = fingerprint(relative_path, content)
+        target = os.path.join(dist, *hashed.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(content)
+        manifest['assets'][relative_path] = hashed
+        if posixpath.splitext(relative_path)[1].lower() in COMPRESSIBLE:
+            encodings = compress(target, content, brotli)
+            if encodings:
+                manifest['encodings'][hashed] = encodings
+
+    with open(os.path.join(dist, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+
+class Assets(object):
+    """Gives each app its own AssetManifest, in app.extensions['assets']."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['assets'] = AssetManifest(app)
+
+
+class AssetManifest(object):
+    """One app's built assets, served from its static/dist."""
+
+    def __init__(self, app):
+        self.assets = {}
+        self.encodings = {}
+        self.hashed = set()
+        self.max_age = app.config.get('ASSETS_MAX_AGE', 365 * 24 * 3600)
+        self.dist = os.path.join(app.static_folder, DIST)
+        manifest_path = os.path.join(self.dist, MANIFEST)
+        if not app.config.get('ASSETS_ENABLED', True) or not os.path.exists(manifest_path):
+            return
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        self.assets = manifest['assets']
+        self.encodings = manifest['encodings']
+        self.hashed = set(self.assets.values())
+        # More specific than the static route, so it takes /static/dist/ over.
+        app.add_url_rule(app.static_url_path + '/' + DIST + '/<path:filename>', 'asset', self.send)
+        app.url_defaults(self._hashed_filename)
+
+    def _hashed_filename(self, endpoint, values):
+        if endpoint == 'static' and values.get('filename') in self.assets:
+            values['filename'] = DIST + '/' + self.assets[values['filename']]
+
+    def send(self, filename):
+        if filename not in self.hashed:
+            abort(404)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        for encoding, suffix in ENCODINGS:
+            if encoding in self.encodings.get(filename, ()) and request.accept_encodings.quality(encoding) > 0:
+                response = send_from_directory(self.dist, filename + suffix, mimetype=mimetype, max_age=self.max_age)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(self.dist, filename, mimetype=mimetype, max_age=self.max_age)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+@click.command('build-assets')
+@click.option('--clean', is_flag=True, help='Remove static/dist first instead of adding to it.')
+@with_appcontext
+def build_assets(clean):
+    """Write content-hashed, gzip/brotli-compressed copies of static/ to static/dist."""
+    manifest = build(current_app.static_folder, clean, echo=click.echo)
+    click.echo('{} assets, {} compressed.'.format(len(manifest['assets']), len(manifest['encodings'])))
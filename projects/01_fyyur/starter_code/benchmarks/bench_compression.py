@@ -0,0 +1,120 @@
+"""Bytes saved against CPU spent by response compression.
+
+Renders a sample of real responses (pages, API JSON and a streamed CSV
+export) from the database the app is configured with, then runs each body
+through CompressionMiddleware with every algorithm and level, both as one
+body with a Content-Length and streamed in --chunk-size chunks. For each it
+reports the compressed size, the CPU time per response and what that buys
+on a link of --bandwidth Mbit/s: transfer time saved minus CPU spent.
+
+    $ python benchmarks/bench_compression.py
+    $ python benchmarks/bench_compression.py --routes venues,api_artists --bandwidth 10 --output compression.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_routes import ROUTES, Sample, app  # noqa: E402
+from compression import CompressionMiddleware, brotli_available  # noqa: E402
+from models import db  # noqa: E402
+
+DEFAULT_ROUTES = ['venues', 'venue', 'artists', 'shows', 'search_artists', 'api_artists', 'api_shows']
+EXPORT = ('export_shows', '/export/shows.csv?from=2000-01-01')
+LEVELS = [('gzip', 1), ('gzip', 6), ('gzip', 9), ('br', 1), ('br', 4), ('br', 11)]
+
+
+def fetch_bodies(routes, sample):
+    client = app.test_client()
+    bodies = {}
+    for route in routes:
+        method, path, data = ROUTES[route](sample)
+        response = client.open(path, method=method, data=data)
+        bodies[route] = (response.mimetype, response.get_data())
+    response = client.get(EXPORT[1])
+    bodies[EXPORT[0]] = (response.mimetype, response.get_data())
+    return bodies
+
+
+def static_app(mimetype, body, chunk_size):
+    def wsgi_app(environ, start_response):
+        headers = [('Content-Type', mimetype)]
+        if chunk_size is None:
+            headers.append(('Content-Length', str(len(body))))
+            start_response('200 OK', headers)
+            return [body]
+        start_response('200 OK', headers)
+        return (body[start:start + chunk_size] for start in range(0, len(body), chunk_size))
+    return wsgi_app
+
+
+def measure(mimetype, body, algorithm, level, chunk_size, repeat):
+    middleware = CompressionMiddleware(static_app(mimetype, body, chunk_size), algorithms=(algorithm,),
+                                       min_size=0, mimetypes=(mimetype,), gzip_level=level, brotli_quality=level)
+    environ = {'REQUEST_METHOD': 'GET', 'HTTP_ACCEPT_ENCODING': algorithm}
+    size = 0
+    started = time.process_time()
+    for _ in range(repeat):
+        size = sum(len(chunk) for chunk in middleware(environ, lambda status, headers, exc_info=None: None))
+    return size, (time.process_time() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--routes', help='comma-separated subset of: ' + ', '.join(ROUTES))
+    parser.add_argument('--repeat', type=int, default=50, help='compressions timed per body and level')
+    parser.add_argument('--chunk-size', type=int, default=16 * 1024, help='chunk size of the streamed runs')
+    parser.add_argument('--bandwidth', type=float, default=20.0, help='client link in Mbit/s')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+    routes = args.routes.split(',') if args.routes else DEFAULT_ROUTES
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        parser.error('unknown routes: ' + ', '.join(sorted(unknown)))
+
+    if 'page_cache' in app.extensions:
+        app.extensions['page_cache'].enabled = False
+    with app.app_context():
+        sample = Sample(random.Random(args.seed))
+        db.session.remove()
+    bodies = fetch_bodies(routes, sample)
+    levels = [(algorithm, level) for algorithm, level in LEVELS if algorithm != 'br' or brotli_available()]
+    if len(levels) < len(LEVELS):
+        print('brotli is not installed; measuring gzip only.\n')
+
+    bytes_per_ms = args.bandwidth * 1e6 / 8 / 1000
+    results = {}
+    print('{:<16} {:>9} {:<7} {:<7} {:>9} {:>7} {:>8} {:>8} {:>9}'.format(
+        'route', 'raw KB', 'level', 'mode', 'out KB', 'saved', 'cpu ms', 'MB/s', 'net ms'))
+    for route, (mimetype, body) in bodies.items():
+        results[route] = {'mimetype': mimetype, 'raw_bytes': len(body), 'runs': []}
+        for algorithm, level in levels:
+            for mode, chunk_size in (('body', None), ('stream', args.chunk_size)):
+                size, seconds = measure(mimetype, body, algorithm, level, chunk_size, args.repeat)
+                cpu_ms = seconds * 1000
+                net_ms = (len(body) - size) / bytes_per_ms - cpu_ms
+                results[route]['runs'].append({
+                    'algorithm': algorithm, 'level': level, 'mode': mode, 'bytes': size,
+                    'saved_pct': round(100.0 * (1 - float(size) / len(body)), 1) if body else 0.0,
+                    'cpu_ms': round(cpu_ms, 3), 'net_ms': round(net_ms, 3),
+                })
+                print('{:<16} {:>9.1f} {:<7} {:<7} {:>9.1f} {:>6.1f}% {:>8.3f} {:>8.1f} {:>9.2f}'.format(
+                    route, len(body) / 1024.0, '{}-{}'.format(algorithm, level), mode, size / 1024.0,
+                    results[route]['runs'][-1]['saved_pct'], cpu_ms,
+                    len(body) / 1e6 / seconds if seconds else float('inf'), net_ms))
+    print('\nnet ms: transfer time saved at {:g} Mbit/s minus CPU time; negative means not worth it.'.format(
+        args.bandwidth))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'bandwidth_mbit': args.bandwidth, 'chunk_size': args.chunk_size, 'routes': results},
+                      f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Micro-benchmark for the `datetime` Jinja filter.
+
+Compares the previous filter (dateutil parse of a strftime string plus a
+babel pattern rebuilt per call) with format_datetime() on datetime objects
+and with format_datetimes(), which the show lists format their times with.
+
+    $ python benchmarks/bench_datetime_filter.py --values 5000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import format_datetime, format_datetimes  # noqa: E402
+
+
+def previous_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--values', type=int, default=5000, help='datetimes formatted per run')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per variant; the best is reported')
+    parser.add_argument('--format', default='full')
+    args = parser.parse_args()
+
+    start = datetime(2020, 1, 1, 19, 30)
+    values = [start + timedelta(hours=7 * i) for i in range(args.values)]
+    strings = [value.strftime("%m/%d/%Y, %H:%M") for value in values]
+    assert [previous_format_datetime(v, args.format) for v in strings[:50]] == \
+        format_datetimes(values[:50], args.format)
+
+    variants = [
+        ('previous (parse + pattern per call)', lambda: [previous_format_datetime(v, args.format) for v in strings]),
+        ('format_datetime (datetime input)', lambda: [format_datetime(v, args.format) for v in values]),
+        ('format_datetimes (batch)', lambda: format_datetimes(values, args.format)),
+    ]
+    baseline = None
+    for name, run in variants:
+        best = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        per_value = best / args.values * 1e6
+        baseline = baseline or per_value
+        print('{:<38} {:8.2f} us/value  {:6.1f}x'.format(name, per_value, baseline / per_value))
+
+
+if __name__ == '__main__':
+    main()
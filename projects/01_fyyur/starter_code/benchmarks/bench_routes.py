@@ -0,0 +1,274 @@
+"""Latency, SQL statements and memory per route.
+
+Drives each route through the Flask test client, or a running server with
+--url, and reports p50/p95/p99 latency, statements per request and memory.
+Ids, cities and search terms are sampled from the database the app is
+configured with, so load it first with generate_dataset.py. The page cache
+is bypassed unless --cache is given (test client only).
+
+Results can be written as JSON and compared with an earlier run, e.g. one
+taken on the previous commit:
+
+    $ python benchmarks/bench_routes.py --requests 200 --output before.json
+    $ python benchmarks/bench_routes.py --requests 200 --output after.json --compare before.json
+    $ python benchmarks/bench_routes.py --url http://localhost:5000 --routes venue,artist,shows
+
+Statements per request are counted in-process with the test client; with
+--url they are taken from the X-SQL-Queries header, which the server only
+sends with SQL_PROFILER_ENABLED=1. Memory is the peak Python allocation of
+a request (tracemalloc, test client only) and the process's maximum RSS.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sqlalchemy import event, func  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from app import create_app  # noqa: E402
+from models import db, Artist, Show, Venue  # noqa: E402
+
+app = create_app()
+
+SEARCH_TERMS = ['the', 'blue', 'hall', 'rivers', 'neon lounge', 'sam']
+GENRES = ['Jazz', 'Rock n Roll', 'Folk']
+
+
+class Sample(object):
+    """Ids and values to build request paths from."""
+
+    def __init__(self, rng, size=200):
+        self.rng = rng
+        self.venue_ids = [row_id for row_id, in db.session.query(Venue.id).order_by(func.random()).limit(size)]
+        self.artist_ids = [row_id for row_id, in db.session.query(Artist.id).order_by(func.random()).limit(size)]
+        self.areas = db.session.query(Venue.city, Venue.state).distinct().all()
+        if not (self.venue_ids and self.artist_ids):
+            raise SystemExit('No venues or artists; load a dataset with generate_dataset.py first.')
+
+    def venue(self):
+        return self.rng.choice(self.venue_ids)
+
+    def artist(self):
+        return self.rng.choice(self.artist_ids)
+
+    def area(self):
+        return self.rng.choice(self.areas)
+
+    def term(self):
+        return self.rng.choice(SEARCH_TERMS)
+
+    def genre(self):
+        return self.rng.choice(GENRES)
+
+
+# name: (method, path, form data)
+ROUTES = {
+    'home': lambda s: ('GET', '/', None),
+    'venues': lambda s: ('GET', '/venues', None),
+    'venues_lazy': lambda s: ('GET', '/venues?lazy=1', None),
+    'venues_area': lambda s: ('GET', '/venues?' + urlencode(dict(zip(('city', 'state'), s.area()))), None),
+    'venues_genre': lambda s: ('GET', '/venues?' + urlencode({'genre': s.genre()}), None),
+    'venue': lambda s: ('GET', '/venues/{}'.format(s.venue()), None),
+    'artists': lambda s: ('GET', '/artists', None),
+    'artists_genre': lambda s: ('GET', '/artists?' + urlencode({'genre': s.genre()}), None),
+    'artist': lambda s: ('GET', '/artists/{}'.format(s.artist()), None),
+    'shows': lambda s: ('GET', '/shows', None),
+    'shows_upcoming': lambda s: ('GET', '/shows?from={}'.format(date.today().isoformat()), None),
+    'search_venues': lambda s: ('POST', '/venues/search', {'search_term': s.term()}),
+    'search_artists': lambda s: ('POST', '/artists/search', {'search_term': s.term()}),
+    'api_venue': lambda s: ('GET', '/api/v1/venues/{}'.format(s.venue()), None),
+    'api_artists': lambda s: ('GET', '/api/v1/artists', None),
+    'api_shows': lambda s: ('GET', '/api/v1/shows?from={}'.format(date.today().isoformat()), None),
+}
+
+
+class StatementCounter(object):
+
+    def __init__(self):
+        self.count = 0
+        event.listen(Engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+class TestClientDriver(object):
+
+    def __init__(self):
+        self.client = app.test_client()
+        self.statements = StatementCounter()
+
+    def request(self, method, path, data):
+        before = self.statements.count
+        started = time.perf_counter()
+        response = self.client.open(path, method=method, data=data)
+        response.get_data()
+        elapsed = time.perf_counter() - started
+        return response.status_code, elapsed, self.statements.count - before
+
+    def peak_memory(self, method, path, data):
+        tracemalloc.start()
+        try:
+            self.client.open(path, method=method, data=data).get_data()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+
+class ServerDriver(object):
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def request(self, method, path, data):
+        body = urlencode(data).encode() if data is not None else None
+        started = time.perf_counter()
+        with urlopen(Request(self.url + path, data=body, method=method)) as response:
+            response.read()
+            elapsed = time.perf_counter() - started
+            statements = response.headers.get('X-SQL-Queries')
+            return response.status, elapsed, int(statements) if statements is not None else None
+
+    def peak_memory(self, method, path, data):
+        return None
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def bench_route(driver, sample, route, requests, warmup, memory_requests):
+    for _ in range(warmup):
+        driver.request(*ROUTES[route](sample))
+    timings, statements, statuses = [], [], set()
+    for _ in range(requests):
+        status, elapsed, count = driver.request(*ROUTES[route](sample))
+        timings.append(elapsed * 1000)
+        statuses.add(status)
+        if count is not None:
+            statements.append(count)
+    peaks = [driver.peak_memory(*ROUTES[route](sample)) for _ in range(memory_requests)]
+    timings.sort()
+    return {
+        'requests': requests,
+        'statuses': sorted(statuses),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'max_ms': round(timings[-1], 3),
+        'queries_per_request': round(float(sum(statements)) / len(statements), 2) if statements else None,
+        'queries_max': max(statements) if statements else None,
+        'peak_alloc_kb': round(max(peaks) / 1024.0, 1) if peaks and None not in peaks else None,
+    }
+
+
+def git_commit():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL)
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD'], stderr=subprocess.DEVNULL) != 0
+        return commit.decode().strip() + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current, threshold):
+    """Print the change of each route's p50/p95 and return the routes that regressed."""
+    regressed = []
+    print('\nvs {} ({}):'.format(previous['meta'].get('commit'), previous['meta'].get('timestamp')))
+    for route, result in current['routes'].items():
+        before = previous['routes'].get(route)
+        if before is None:
+            continue
+        changes = []
+        for key in ('p50_ms', 'p95_ms'):
+            change = (result[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            changes.append('{} {:.2f} -> {:.2f} ({:+.0f}%)'.format(key[:3], before[key], result[key], change))
+            if change > threshold:
+                regressed.append(route)
+        if before.get('queries_per_request') != result.get('queries_per_request'):
+            changes.append('queries {} -> {}'.format(before.get('queries_per_request'),
+                                                     result.get('queries_per_request')))
+        print('{:<16} {}'.format(route, '  '.join(changes)))
+    return sorted(set(regressed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--routes', help='comma-separated subset of: ' + ', '.join(ROUTES))
+    parser.add_argument('--requests', type=int, default=50, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed requests per route first')
+    parser.add_argument('--memory-requests', type=int, default=3, help='requests traced for memory per route')
+    parser.add_argument('--url', help='benchmark a running server instead of the test client')
+    parser.add_argument('--cache', action='store_true', help='keep the page cache on')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--compare', help='JSON results of an earlier run')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='percent p50/p95 increase that counts as a regression')
+    args = parser.parse_args()
+    routes = args.routes.split(',') if args.routes else list(ROUTES)
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        parser.error('unknown routes: ' + ', '.join(sorted(unknown)))
+
+    if not args.cache and 'page_cache' in app.extensions:
+        app.extensions['page_cache'].enabled = False
+    rng = random.Random(args.seed)
+    with app.app_context():
+        sample = Sample(rng)
+        dataset = {model.__tablename__: db.session.query(func.count(model.id)).scalar()
+                   for model in (Venue, Artist, Show)}
+        db.session.remove()
+
+    driver = ServerDriver(args.url) if args.url else TestClientDriver()
+    results = {}
+    print('{:<16} {:>9} {:>9} {:>9} {:>9} {:>8} {:>10}'.format(
+        'route', 'p50 ms', 'p95 ms', 'p99 ms', 'mean ms', 'queries', 'peak KB'))
+    for route in routes:
+        result = results[route] = bench_route(driver, sample, route, args.requests, args.warmup,
+                                              0 if args.url else args.memory_requests)
+        print('{:<16} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f} {:>8} {:>10}'.format(
+            route, result['p50_ms'], result['p95_ms'], result['p99_ms'], result['mean_ms'],
+            result['queries_per_request'] if result['queries_per_request'] is not None else '-',
+            result['peak_alloc_kb'] if result['peak_alloc_kb'] is not None else '-'))
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'driver': args.url or 'test_client',
+            'page_cache': args.cache,
+            'dataset': dataset,
+            'requests': args.requests,
+            'seed': args.seed,
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        'routes': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(json.load(f), report, args.threshold)
+        if regressed:
+            print('\nRegressed by more than {:.0f}%: {}'.format(args.threshold, ', '.join(regressed)))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
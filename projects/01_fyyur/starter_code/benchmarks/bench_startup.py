@@ -0,0 +1,98 @@
+"""Worker startup time: interpreter, `import app` and create_app().
+
+Starts fresh interpreters the way a worker boots and times importing app.py
+and building the app, against a bare interpreter as the baseline. One more
+run under `python -X importtime` attributes the import time to top-level
+packages, to show what still loads eagerly. Nothing connects to the
+database, but DATABASE_URL must parse.
+
+    $ python benchmarks/bench_startup.py --runs 10
+    $ python benchmarks/bench_startup.py --top 25 --output startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BOOT = ('import time; started = time.perf_counter(); import app; imported = time.perf_counter(); '
+        'app.create_app(); print(imported - started, time.perf_counter() - imported)')
+
+
+def run(code, importtime=False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code]
+    started = time.perf_counter()
+    process = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if process.returncode:
+        raise SystemExit(process.stderr)
+    return elapsed, process
+
+
+def import_times(stderr):
+    """Self and cumulative microseconds per module from -X importtime output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def by_package(modules):
+    packages = defaultdict(int)
+    for name, self_us, _ in modules:
+        packages[name.split('.')[0]] += self_us
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+
+def summary(values):
+    ordered = sorted(values)
+    return {'min_ms': round(ordered[0] * 1000, 1), 'p50_ms': round(ordered[len(ordered) // 2] * 1000, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='interpreters started per measurement')
+    parser.add_argument('--top', type=int, default=15, help='packages listed by import time')
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    baseline = [run('pass')[0] for _ in range(args.runs)]
+    processes, imports, creates = [], [], []
+    for _ in range(args.runs):
+        elapsed, process = run(BOOT)
+        import_seconds, create_seconds = map(float, process.stdout.split()[-2:])
+        processes.append(elapsed)
+        imports.append(import_seconds)
+        creates.append(create_seconds)
+    _, traced = run(BOOT, importtime=True)
+    modules = import_times(traced.stderr)
+    packages = by_package(modules)
+
+    results = {
+        'interpreter': summary(baseline),
+        'process': summary(processes),
+        'import_app': summary(imports),
+        'create_app': summary(creates),
+        'modules_imported': len(modules),
+        'packages': [{'package': package, 'self_ms': round(us / 1000.0, 1)} for package, us in packages],
+    }
+    print('{:<14} {:>9} {:>9}'.format('', 'min ms', 'p50 ms'))
+    for key in ('interpreter', 'process', 'import_app', 'create_app'):
+        print('{:<14} {:>9.1f} {:>9.1f}'.format(key, results[key]['min_ms'], results[key]['p50_ms']))
+    print('\n{} modules imported; import time by package (-X importtime, self time):'.format(len(modules)))
+    for package, us in packages[:args.top]:
+        print('  {:<24} {:>8.1f} ms'.format(package, us / 1000.0))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""Seeded synthetic dataset for local benchmarking.
+
+Loads venues, artists and shows into the database configured for the app
+with COPY. Popularity is skewed the way real listings are: a few cities,
+genres, venues and artists account for most of the shows (Zipf weights).
+Shows are placed on two-hour slots from two years ago to two years ahead,
+with no artist or venue booked twice in a slot, so the data satisfies the
+double-booking constraints. The same --seed always produces the same data.
+
+    $ python benchmarks/generate_dataset.py --shows 100000 --truncate
+    $ python benchmarks/generate_dataset.py --shows 10000000 --truncate --batch-size 200000
+"""
+import argparse
+import bisect
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sqlalchemy import func, text  # noqa: E402
+
+from app import create_app  # noqa: E402
+from importer import copy_rows  # noqa: E402
+from models import db, Artist, Show, Venue  # noqa: E402
+import dashboard  # noqa: E402
+import upcoming  # noqa: E402
+
+app = create_app()
+
+CITIES = [
+    ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('San Francisco', 'CA'), ('Austin', 'TX'),
+    ('Seattle', 'WA'), ('Nashville', 'TN'), ('New Orleans', 'LA'), ('Boston', 'MA'), ('Denver', 'CO'),
+    ('Portland', 'OR'), ('Atlanta', 'GA'), ('Philadelphia', 'PA'), ('Miami', 'FL'), ('Detroit', 'MI'),
+    ('Minneapolis', 'MN'), ('Phoenix', 'AZ'), ('Kansas City', 'MO'), ('Baltimore', 'MD'), ('Memphis', 'TN'),
+]
+GENRES = [
+    'Rock n Roll', 'Pop', 'Hip-Hop', 'Jazz', 'Electronic', 'Alternative', 'Country', 'R&B', 'Folk', 'Blues',
+    'Soul', 'Funk', 'Reggae', 'Punk', 'Heavy Metal', 'Classical', 'Instrumental', 'Swing', 'Musical Theatre',
+    'Other',
+]
+ADJECTIVES = ['Blue', 'Golden', 'Velvet', 'Electric', 'Rusty', 'Silver', 'Crimson', 'Midnight', 'Neon', 'Wild',
+              'Hollow', 'Lucky', 'Broken', 'Little', 'Grand', 'Painted', 'Howling', 'Quiet', 'Iron', 'Paper']
+NOUNS = ['Room', 'Hall', 'Tavern', 'Lounge', 'Garage', 'Ballroom', 'Cellar', 'Parlor', 'Stage', 'Factory',
+         'Den', 'Barn', 'Theatre', 'Club', 'Depot', 'Hangar', 'Attic', 'Saloon', 'Chapel', 'Yard']
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Maya', 'Leo', 'Nina', 'Omar', 'Ruby', 'Theo', 'Iris', 'Mateo', 'Zoe',
+               'Kai', 'Lena', 'Felix', 'Ada', 'Hugo', 'Nora', 'Ezra', 'Mila']
+LAST_NAMES = ['Rivers', 'Stone', 'Quevedo', 'Hart', 'Nakamura', 'Okafor', 'Lindqvist', 'Moreau', 'Silva', 'Kowalski',
+              'Reyes', 'Byrne', 'Haddad', 'Novak', 'Park', 'Mensah', 'Duarte', 'Fischer', 'Ivanova', 'Walsh']
+SLOT = timedelta(hours=2)
+
+
+def zipf_cumulative(n, exponent):
+    """Cumulative Zipf weights for n items, as used by pick()."""
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+def pick(rng, cumulative):
+    return bisect.bisect_left(cumulative, rng.random() * cumulative[-1])
+
+
+def pick_distinct(rng, cumulative, count):
+    # Skewed sample without replacement; count is well below len(cumulative).
+    chosen = set()
+    while len(chosen) < count:
+        chosen.add(pick(rng, cumulative))
+    return list(chosen)
+
+
+def pick_genres(rng, genre_weights):
+    return sorted({GENRES[pick(rng, genre_weights)] for _ in range(rng.choice((1, 1, 2, 2, 3)))})
+
+
+def venue_rows(rng, count, city_weights, genre_weights):
+    for i in range(count):
+        city, state = CITIES[pick(rng, city_weights)]
+        yield {
+            'name': 'The {} {}'.format(rng.choice(ADJECTIVES), rng.choice(NOUNS)),
+            'genres': pick_genres(rng, genre_weights),
+            'city': city,
+            'state': state,
+            'address': '{} {} Street'.format(rng.randint(1, 9999), rng.choice(LAST_NAMES)),
+            'phone': '{}-{}-{}'.format(rng.randint(200, 999), rng.randint(100, 999), rng.randint(1000, 9999)),
+            'website': 'https://example.com/venues/{}'.format(i),
+            'image_link': 'https://example.com/venues/{}.jpg'.format(i),
+            'facebook_link': 'https://www.facebook.com/venue{}'.format(i),
+            'seeking_talent': rng.random() < 0.3,
+            'seeking_description': '',
+        }
+
+
+def artist_rows(rng, count, city_weights, genre_weights):
+    for i in range(count):
+        city, state = CITIES[pick(rng, city_weights)]
+        if rng.random() < 0.5:
+            name = '{} {}'.format(rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES))
+        else:
+            name = '{} {}s'.format(rng.choice(ADJECTIVES), rng.choice(NOUNS))
+        yield {
+            'name': name,
+            'genres': pick_genres(rng, genre_weights),
+            'city': city,
+            'state': state,
+            'phone': '{}-{}-{}'.format(rng.randint(200, 999), rng.randint(100, 999), rng.randint(1000, 9999)),
+            'website': 'https://example.com/artists/{}'.format(i),
+            'image_link': 'https://example.com/artists/{}.jpg'.format(i),
+            'facebook_link': 'https://www.facebook.com/artist{}'.format(i),
+            'seeking_venue': rng.random() < 0.3,
+            'seeking_description': '',
+        }
+
+
+def show_rows(rng, count, venue_ids, artist_ids, exponent):
+    """Shows spread over two-hour slots, each slot using distinct venues and artists."""
+    first_slot = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=730)
+    slots = int(timedelta(days=1460) / SLOT)
+    per_slot = max(1, -(-count // slots))
+    used_slots = -(-count // per_slot)
+    if per_slot * 2 > min(len(venue_ids), len(artist_ids)):
+        raise SystemExit('Too few venues or artists for {} shows; raise --venues / --artists.'.format(count))
+    venue_weights = zipf_cumulative(len(venue_ids), exponent)
+    artist_weights = zipf_cumulative(len(artist_ids), exponent)
+    # Earlier slots first, so that the generated start times are ordered
+    # like a growing production table.
+    emitted = 0
+    for used in range(used_slots):
+        start_time = first_slot + (used * slots // used_slots) * SLOT
+        size = min(per_slot, count - emitted)
+        for venue, artist in zip(pick_distinct(rng, venue_weights, size), pick_distinct(rng, artist_weights, size)):
+            yield {'artist_id': artist_ids[artist], 'venue_id': venue_ids[venue],
+                   'start_time': start_time, 'duration_minutes': 120}
+        emitted += size
+
+
+def load(model, rows, batch_size):
+    batch = []
+    columns = None
+    loaded = 0
+    for row in rows:
+        columns = columns or sorted(row)
+        batch.append(row)
+        if len(batch) >= batch_size:
+            copy_rows(model, columns, batch)
+            db.session.commit()
+            loaded += len(batch)
+            del batch[:]
+            print('  {} {}'.format(model.__tablename__, loaded), end='\r', flush=True)
+    if batch:
+        copy_rows(model, columns, batch)
+        db.session.commit()
+        loaded += len(batch)
+    print('  {} {} rows'.format(model.__tablename__, loaded))
+
+
+def new_ids(model, after):
+    return [row_id for row_id, in db.session.query(model.id).filter(model.id > after).order_by(model.id)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shows', type=int, default=100000, help='1000 up to 10000000')
+    parser.add_argument('--venues', type=int, help='defaults to shows / 20, at least 200')
+    parser.add_argument('--artists', type=int, help='defaults to shows / 10, at least 400')
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of venue and artist popularity')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=50000)
+    parser.add_argument('--truncate', action='store_true', help='empty Venue, Artist, Show and the dashboard counters first')
+    args = parser.parse_args()
+    venues = args.venues or max(200, args.shows // 20)
+    artists = args.artists or max(400, args.shows // 10)
+
+    rng = random.Random(args.seed)
+    city_weights = zipf_cumulative(len(CITIES), 1.0)
+    genre_weights = zipf_cumulative(len(GENRES), 0.8)
+    started = time.time()
+    with app.app_context():
+        if args.truncate:
+            db.session.execute(text('TRUNCATE "Show", "Artist", "Venue", "DashboardCounter" RESTART IDENTITY CASCADE'))
+            db.session.commit()
+        last_venue = db.session.query(func.coalesce(func.max(Venue.id), 0)).scalar()
+        last_artist = db.session.query(func.coalesce(func.max(Artist.id), 0)).scalar()
+
+        load(Venue, venue_rows(rng, venues, city_weights, genre_weights), args.batch_size)
+        load(Artist, artist_rows(rng, artists, city_weights, genre_weights), args.batch_size)
+        load(Show, show_rows(rng, args.shows, new_ids(Venue, last_venue), new_ids(Artist, last_artist), args.skew),
+             args.batch_size)
+
+        print('  UpcomingShow {} rows'.format(upcoming.rebuild()))
+        dashboard.rebuild()
+        db.session.commit()
+        for model in (Venue, Artist, Show):
+            db.session.execute(text('ANALYZE "{}"'.format(model.__tablename__)))
+        db.session.execute(text('ANALYZE "UpcomingShow"'))
+        db.session.commit()
+    print('Done in {:.1f}s.'.format(time.time() - started))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+#----------------------------------------------------------------------------#
+# Rendered-page cache.
+#
+# GET views decorated with PageCache.cached() are stored under a key built
+# from the request path and query string, together with a set of tags such
+# as 'venues' or 'venue:3'. Write handlers call PageCache.invalidate() with
+# the tags they affect. Entries past their timeout are still served for
+# PAGE_CACHE_STALE_TIMEOUT seconds while a background thread re-renders them.
+# PageCache.remember() keeps small computed values under the same tags.
+#----------------------------------------------------------------------------#
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import Response, copy_current_request_context, current_app, g, make_response, request, session
+
+
+class SimpleBackend(object):
+    """Process-local LRU store. Invalidations only reach this process."""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._entry_tags = {}
+        self._generation = 0
+        self._invalidated_at = 0.0
+        self._lock = threading.Lock()
+
+    def generation(self):
+        return self._generation
+
+    def invalidated_at(self):
+        return self._invalidated_at
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, tags, generation=None):
+        """Store entry, unless generation is given and tags were invalidated since."""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            self._remove(key)
+            self._entries[key] = entry
+            self._entry_tags[key] = set(tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def delete_tags(self, tags):
+        removed = 0
+        with self._lock:
+            self._generation += 1
+            self._invalidated_at = time.time()
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    removed += self._remove(key)
+        return removed
+
+    def _remove(self, key):
+        # Takes the key out of its tags' sets too, so that they only ever
+        # hold keys that are still stored.
+        for tag in self._entry_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return self._entries.pop(key, None) is not None
+
+
+# KEYS: generation, entry, tag sets; ARGV: expected generation or '', entry,
+# ttl, entry key. Tag sets live as long as their longest-lived entry.
+SET_SCRIPT = """
+if ARGV[1] ~= '' and (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+for i = 3, #KEYS do
+    redis.call('SADD', KEYS[i], ARGV[4])
+    if redis.call('TTL', KEYS[i]) < tonumber(ARGV[3]) then
+        redis.call('EXPIRE', KEYS[i], ARGV[3])
+    end
+end
+return 1
+"""
+# KEYS: generation, invalidation time, tag sets; ARGV: key prefix, time.
+DELETE_TAGS_SCRIPT = """
+redis.call('INCR', KEYS[1])
+redis.call('SET', KEYS[2], ARGV[2])
+local removed = 0
+for i = 3, #KEYS do
+    for _, key in ipairs(redis.call('SMEMBERS', KEYS[i])) do
+        removed = removed + redis.call('DEL', ARGV[1] .. key)
+    end
+    redis.call('DEL', KEYS[i])
+end
+return removed
+"""
+
+
+class RedisBackend(object):
+    """Shared store so that every worker sees the same entries, invalidations
+    and generation. Writes and invalidations are each one Lua script, so a
+    key cannot be added to a tag set between it being read and deleted."""
+
+    def __init__(self, url, prefix='fyyur:page:'):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._generation_key = prefix + 'generation'
+        self._invalidated_at_key = prefix + 'invalidated_at'
+        self._set = self._client.register_script(SET_SCRIPT)
+        self._delete_tags = self._client.register_script(DELETE_TAGS_SCRIPT)
+
+    def generation(self):
+        return int(self._client.get(self._generation_key) or 0)
+
+    def invalidated_at(self):
+        return float(self._client.get(self._invalidated_at_key) or 0)
+
+    def get(self, key):
+        data = self._client.get(self.prefix + key)
+        return pickle.loads(data) if data is not None else None
+
+    def set(self, key, entry, tags, generation=None):
+        """Store entry, unless generation is given and tags were invalidated since."""
+        ttl = max(1, int(entry['stale_until'] - time.time()))
+        keys = [self._generation_key, self.prefix + key] + [self.prefix + 'tag:' + tag for tag in tags]
+        args = ['' if generation is None else generation, pickle.dumps(entry), ttl, key]
+        return bool(self._set(keys=keys, args=args))
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def delete_tags(self, tags):
+        keys = [self._generation_key, self._invalidated_at_key] + [self.prefix + 'tag:' + tag for tag in tags]
+        return self._delete_tags(keys=keys, args=[self.prefix, repr(time.time())])
+
+
+class PageCache(object):
+    """Decorators and helpers acting on the cache of the current app, kept in
+    app.extensions['page_cache'], so that one PageCache serves every app
+    create_app() builds."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['page_cache'] = CacheState(app.config)
+
+    @property
+    def state(self):
+        return current_app.extensions['page_cache']
+
+    def cached(self, *tags):
+        """Cache a GET view. Tags may reference view arguments, e.g. 'venue:{venue_id}'."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                return self.state.serve(view, tags, kwargs)
+            return wrapper
+        return decorator
+
+    def remember(self, key, tags, compute):
+        return self.state.remember(key, tags, compute)
+
+    def invalidate(self, *tags):
+        return self.state.invalidate(*tags)
+
+    def stats(self):
+        return self.state.stats()
+
+
+class CacheState(object):
+    """One app's backend, settings and counters."""
+
+    def __init__(self, config):
+        self.timeout = config.get('PAGE_CACHE_TIMEOUT', 300)
+        self.stale_timeout = config.get('PAGE_CACHE_STALE_TIMEOUT', 60)
+        self.enabled = config.get('PAGE_CACHE_ENABLED', True)
+        self.replica_lag_window = config.get('REPLICA_LAG_WINDOW', 5)
+        if config.get('PAGE_CACHE_BACKEND', 'simple') == 'redis':
+            self.backend = RedisBackend(config['PAGE_CACHE_REDIS_URL'])
+        else:
+            self.backend = SimpleBackend(config.get('PAGE_CACHE_MAX_ENTRIES', 1000))
+        self.counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'bypasses': 0, 'invalidated': 0}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def serve(self, view, tags, kwargs):
+        # Pending flash messages are rendered into the page, so such
+        # responses must neither be served from nor written to the cache.
+        if not self.enabled or request.method != 'GET' or session.get('_flashes'):
+            self._count('bypasses')
+            return view(**kwargs)
+
+        key = request.path + '?' + urlencode(sorted(request.args.items(multi=True)))
+        entry_tags = [tag.format(**kwargs) for tag in tags]
+        entry = self.backend.get(key)
+        now = time.time()
+        if entry is not None and now < entry['fresh_until']:
+            self._count('hits')
+            return self._response(entry, 'HIT')
+        if entry is not None and now < entry['stale_until']:
+            self._count('stale_hits')
+            self._refresh(key, entry_tags, view, kwargs)
+            return self._response(entry, 'STALE')
+
+        self._count('misses')
+        generation = self.backend.generation()
+        response = make_response(view(**kwargs))
+        self._store(key, entry_tags, response, generation)
+        response.headers['X-Cache'] = 'MISS'
+        return response
+
+    def remember(self, key, tags, compute):
+        """Return compute() cached under key until one of tags is invalidated."""
+        key = 'data:' + key
+        entry = self.backend.get(key) if self.enabled else None
+        if entry is not None and time.time() < entry['stale_until']:
+            self._count('hits')
+            return entry['value']
+        self._count('misses')
+        generation = self.backend.generation()
+        value = compute()
+        now = time.time()
+        self.backend.set(key, {'value': value, 'fresh_until': now + self.timeout,
+                               'stale_until': now + self.timeout}, tags, generation)
+        return value
+
+    def invalidate(self, *tags):
+        removed = self.backend.delete_tags(tags)
+        self._count('invalidated', removed)
+        return removed
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_ratio'] = float(stats['hits'] + stats['stale_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def _refresh(self, key, tags, view, kwargs):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        generation = self.backend.generation()
+
+        @copy_current_request_context
+        def render():
+            try:
+                self._store(key, tags, make_response(view(**kwargs)), generation)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=render, daemon=True).start()
+
+    def _store(self, key, tags, response, generation):
+        # A write that happened while the page was rendering may not be in
+        # it; the backend refuses the entry if anything was invalidated since.
+        # One just before may not have reached the replica it was read from.
+        if response.status_code != 200 or response.is_streamed:
+            return
+        if g.get('read_from_replica') and time.time() - self.backend.invalidated_at() < self.replica_lag_window:
+            return
+        now = time.time()
+        self.backend.set(key, {
+            'body': response.get_data(),
+            'status': response.status_code,
+            'content_type': response.content_type,
+            'fresh_until': now + self.timeout,
+            'stale_until': now + self.timeout + self.stale_timeout,
+        }, tags, generation)
+
+    def _response(self, entry, state):
+        response = Response(entry['body'], status=entry['status'], content_type=entry['content_type'])
+        response.headers['X-Cache'] = state
+        return response
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] += amount
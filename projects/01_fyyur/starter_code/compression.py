@@ -0,0 +1,260 @@
+#----------------------------------------------------------------------------#
+# Response compression.
+#
+#   compress = Compress(app)         # or Compress().init_app(app)
+#
+# Wraps app.wsgi_app in CompressionMiddleware, which gzip- or brotli-encodes
+# responses whose Content-Type is in COMPRESS_MIMETYPES, in whichever of
+# COMPRESS_ALGORITHMS the client accepts (brotli only with the brotli package
+# installed). Responses under COMPRESS_MIN_SIZE bytes, already encoded ones
+# (such as the precompressed static assets), partial content and
+# "Cache-Control: no-transform" are passed through.
+#
+# Responses with a Content-Length are compressed in one go and keep an exact
+# Content-Length. Streamed responses are compressed as the application
+# yields them and flushed every COMPRESS_MIN_SIZE bytes of input, so that
+# they reach the client without waiting for the rest yet small chunks are
+# not each padded with a flush marker. Compressed responses get a weak ETag,
+# and every compressible one "Vary: Accept-Encoding". A HEAD request gets
+# the headers the GET would, Content-Encoding and Content-Length included.
+#
+# Settings are read from the app config or the environment. brotli is an
+# optional requirement. This file is the only copy: the trivia API and the
+# coffee shop API import it through symlinks in their backends.
+#----------------------------------------------------------------------------#
+
+import os
+import zlib
+from itertools import chain
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from werkzeug.wsgi import ClosingIterator
+
+DEFAULTS = {
+    'COMPRESS_ENABLED': True,
+    'COMPRESS_ALGORITHMS': ('br', 'gzip'),
+    'COMPRESS_MIN_SIZE': 500,
+    'COMPRESS_MIMETYPES': ('text/html', 'text/css', 'text/plain', 'text/csv', 'text/xml', 'text/javascript',
+                           'application/javascript', 'application/json', 'application/x-ndjson',
+                           'application/xml', 'image/svg+xml'),
+    'COMPRESS_GZIP_LEVEL': 6,
+    'COMPRESS_BROTLI_QUALITY': 4,
+}
+
+
+class GzipStream(object):
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data, flush=False):
+        output = self._compressor.compress(data)
+        return output + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else output
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliStream(object):
+
+    def __init__(self, quality):
+        import brotli
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data, flush=False):
+        output = self._compressor.process(data)
+        return output + self._compressor.flush() if flush else output
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def brotli_available():
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _write(data):
+    raise NotImplementedError('CompressionMiddleware does not support the WSGI write() callable')
+
+
+class CompressionMiddleware(object):
+
+    def __init__(self, wsgi_app, algorithms=DEFAULTS['COMPRESS_ALGORITHMS'], min_size=DEFAULTS['COMPRESS_MIN_SIZE'],
+                 mimetypes=DEFAULTS['COMPRESS_MIMETYPES'], gzip_level=DEFAULTS['COMPRESS_GZIP_LEVEL'],
+                 brotli_quality=DEFAULTS['COMPRESS_BROTLI_QUALITY']):
+        self.wsgi_app = wsgi_app
+        self.algorithms = [algorithm for algorithm in algorithms if algorithm != 'br' or brotli_available()]
+        self.min_size = min_size
+        self.mimetypes = frozenset(mimetypes)
+        self.streams = {
+            'gzip': lambda: GzipStream(gzip_level),
+            'br': lambda: BrotliStream(brotli_quality),
+        }
+
+    def negotiate(self, accept_encoding):
+        """The accepted algorithm with the highest quality, ours first on a tie; None for identity."""
+        accepted = parse_accept_header(accept_encoding)
+        best, best_quality = None, 0
+        for algorithm in self.algorithms:
+            quality = accepted.quality(algorithm)
+            if quality > best_quality:
+                best, best_quality = algorithm, quality
+        return best
+
+    def compressible(self, status, headers):
+        code = int(status.split(None, 1)[0])
+        return (200 <= code < 300 and code not in (204, 206)
+                and 'Content-Encoding' not in headers
+                and 'no-transform' not in headers.get('Cache-Control', '')
+                and headers.get('Content-Type', '').split(';')[0].strip().lower() in self.mimetypes)
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') != 'HEAD':
+            return self._respond(environ, start_response)
+
+        # Run the request as a GET, so that the same encoding is chosen and
+        # the same Content-Length computed, and drop the body once the
+        # headers are out.
+        started = []
+
+        def start(status, headers, exc_info=None):
+            started.append(status)
+            return start_response(status, headers, exc_info)
+
+        app_iter = self._respond(dict(environ, REQUEST_METHOD='GET'), start)
+        try:
+            chunks = iter(app_iter)
+            while not started and next(chunks, None) is not None:
+                pass
+        finally:
+            close = getattr(app_iter, 'close', None)
+            if close is not None:
+                close()
+        return []
+
+    def _respond(self, environ, start_response):
+        captured = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return _write
+
+        app_iter = self.wsgi_app(environ, capture)
+        close = getattr(app_iter, 'close', None)
+        chunks = iter(app_iter)
+        held = []
+        if not captured:
+            # start_response may wait for the first chunk.
+            held.append(next(chunks, b''))
+        status, headers, exc_info = captured
+        headers = Headers(headers)
+        if not self.compressible(status, headers):
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return app_iter if not held else ClosingIterator(chain(held, chunks), close)
+
+        _add_vary(headers)
+        algorithm = self.negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        length = headers.get('Content-Length', type=int)
+        if algorithm is None or (length is not None and length < self.min_size):
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return ClosingIterator(chain(held, chunks), close)
+        if length is not None:
+            return self._compress_body(status, headers, exc_info, chain(held, chunks), close, algorithm,
+                                       start_response)
+        return self._compress_stream(status, headers, exc_info, chain(held, chunks), close, algorithm,
+                                     start_response)
+
+    def _compress_body(self, status, headers, exc_info, chunks, close, algorithm, start_response):
+        try:
+            body = b''.join(chunks)
+        finally:
+            if close is not None:
+                close()
+        stream = self.streams[algorithm]()
+        compressed = stream.compress(body) + stream.finish()
+        if len(compressed) >= len(body):
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return [body]
+        _encode(headers, algorithm)
+        headers['Content-Length'] = str(len(compressed))
+        start_response(status, headers.to_wsgi_list(), exc_info)
+        return [compressed]
+
+    def _compress_stream(self, status, headers, exc_info, chunks, close, algorithm, start_response):
+        try:
+            held, size = [], 0
+            for chunk in chunks:
+                held.append(chunk)
+                size += len(chunk)
+                if size >= self.min_size:
+                    break
+            if size < self.min_size:
+                start_response(status, headers.to_wsgi_list(), exc_info)
+                yield b''.join(held)
+                return
+            _encode(headers, algorithm)
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            stream = self.streams[algorithm]()
+            yield stream.compress(b''.join(held), flush=True)
+            pending = 0
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                pending += len(chunk)
+                flush = pending >= self.min_size
+                if flush:
+                    pending = 0
+                output = stream.compress(chunk, flush=flush)
+                if output:
+                    yield output
+            yield stream.finish()
+        finally:
+            if close is not None:
+                close()
+
+
+def _add_vary(headers):
+    vary = headers.get('Vary')
+    if not vary:
+        headers['Vary'] = 'Accept-Encoding'
+    elif vary != '*' and 'accept-encoding' not in vary.lower():
+        headers['Vary'] = vary + ', Accept-Encoding'
+
+
+def _encode(headers, algorithm):
+    headers.remove('Content-Length')
+    headers['Content-Encoding'] = algorithm
+    # The encoded body differs byte for byte; it is still the same resource.
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        headers['ETag'] = 'W/' + etag
+
+
+class Compress(object):
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Settings are kept per app, in app.extensions['compress'].
+        settings = {}
+        for name, default in DEFAULTS.items():
+            value = app.config.get(name, os.environ.get(name, default))
+            if isinstance(default, bool) and isinstance(value, str):
+                value = value.lower() in ('1', 'true', 'yes', 'on')
+            elif isinstance(default, int) and not isinstance(default, bool):
+                value = int(value)
+            elif isinstance(default, tuple) and isinstance(value, str):
+                value = tuple(item.strip() for item in value.split(',') if item.strip())
+            settings[name[len('COMPRESS_'):].lower()] = value
+        app.extensions['compress'] = settings
+        if settings['enabled']:
+            app.wsgi_app = CompressionMiddleware(app.wsgi_app, settings['algorithms'], settings['min_size'],
+                                                 settings['mimetypes'], settings['gzip_level'],
+                                                 settings['brotli_quality'])
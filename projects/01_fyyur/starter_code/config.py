@@ -10,4 +10,102 @@ DEBUG = True
 
 
 # TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgres://marshall@localhost:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgres://marshall@localhost:5432/fyyur')
+
+# Connection pool. Every worker process holds up to
+# DB_POOL_SIZE + DB_MAX_OVERFLOW connections; checkouts wait up to
+# DB_POOL_TIMEOUT seconds for one to be returned. Connections are checked
+# before use (pre-ping) and replaced after DB_POOL_RECYCLE seconds, and
+# statements are cancelled after DB_STATEMENT_TIMEOUT_MS milliseconds.
+# app.py adds pool_metrics.TimedQueuePool as the pool class.
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+    'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+    'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    'connect_args': {
+        'application_name': 'fyyur',
+        'options': '-c statement_timeout={}'.format(int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))),
+    },
+}
+
+# Number of shows listed per /shows page.
+SHOWS_PER_PAGE = 50
+
+# Number of past shows rendered on a venue or artist page.
+PAST_SHOWS_LIMIT = 20
+
+# Number of results per venue or artist search page.
+SEARCH_RESULTS_LIMIT = 20
+
+# Number of newest venues, newest artists and top cities on the home page.
+DASHBOARD_LIST_LENGTH = 5
+
+# Rendered-page cache: 'simple' keeps pages in each worker's memory, 'redis'
+# shares them (and their invalidations) between workers.
+PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'simple')
+PAGE_CACHE_REDIS_URL = os.environ.get('PAGE_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+PAGE_CACHE_TIMEOUT = 300
+PAGE_CACHE_STALE_TIMEOUT = 60
+
+# Number of artists listed per /artists page.
+ARTISTS_PER_PAGE = 100
+
+# Read replicas, as a comma-separated list of database URLs. GET views marked
+# @replica_reads send their SELECTs to them, chosen 'round_robin' or by
+# 'least_latency'. For REPLICA_LAG_WINDOW seconds after a client writes, its
+# reads stay on the primary, and no page read from a replica is cached
+# after any write; set it above the replicas' usual lag.
+REPLICA_DATABASE_URIS = [uri for uri in os.environ.get('REPLICA_DATABASE_URLS', '').split(',') if uri]
+REPLICA_SELECTION = os.environ.get('REPLICA_SELECTION', 'round_robin')
+REPLICA_LAG_WINDOW = 5
+
+# Static assets fingerprinted and compressed by "flask build-assets" are
+# linked by url_for('static') and cached by browsers and CDNs for
+# ASSETS_MAX_AGE seconds. ASSETS_ENABLED=0 serves static/ as it is.
+ASSETS_ENABLED = os.environ.get('ASSETS_ENABLED', '1') == '1'
+ASSETS_MAX_AGE = 365 * 24 * 3600
+
+# Most candidate slots accepted by one POST /api/v1/availability.
+AVAILABILITY_MAX_SLOTS = 1000
+
+# Most ids accepted by one POST /api/v1/<venues|artists>/delete, and how many
+# are deleted per statement and transaction. The endpoint only answers
+# requests with "Authorization: Bearer <BULK_DELETE_TOKEN>", and is off
+# while no token is set.
+BULK_DELETE_TOKEN = os.environ.get('BULK_DELETE_TOKEN')
+BULK_DELETE_MAX_IDS = 10000
+BULK_DELETE_BATCH_SIZE = 1000
+
+# /_stats/cache, /_stats/logging and /_stats/pool report the page cache,
+# log queue and connection pool counters as JSON. They are unauthenticated,
+# so only served when enabled.
+STATS_ENABLED = os.environ.get('STATS_ENABLED', '') == '1'
+
+# Per-request SQL profiling (sql_profiler.py): statement counts, time and
+# repeated statements in X-SQL-* headers, the log and /_stats/sql.
+SQL_PROFILER_ENABLED = os.environ.get('SQL_PROFILER_ENABLED', '') == '1'
+SQL_PROFILER_MAX_QUERIES = 30
+SQL_PROFILER_MAX_TIME_MS = 500
+SQL_PROFILER_MAX_REPEATS = 5
+SQL_PROFILER_ON_THRESHOLD = os.environ.get('SQL_PROFILER_ON_THRESHOLD', 'warn')  # or 'raise'
+
+# Response compression (compression.py): HTML, JSON, CSV and other text
+# responses of at least COMPRESS_MIN_SIZE bytes are sent brotli or gzip
+# encoded, streamed ones chunk by chunk.
+COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', '1') == '1'
+COMPRESS_MIN_SIZE = 500
+COMPRESS_GZIP_LEVEL = 6
+COMPRESS_BROTLI_QUALITY = 4
+
+# Logging outside debug mode (queue_logging.py): records are queued and
+# written to LOG_FILE by a background thread, as 'text' or 'json' lines,
+# rotated at LOG_MAX_BYTES. INFO records of the endpoints in
+# LOG_SAMPLE_RATES, e.g. {'venues': 0.1}, are kept at that rate.
+LOG_FILE = os.environ.get('LOG_FILE', 'error.log')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
+LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', {})  # or 'venues=0.1,show_venue=0.5'
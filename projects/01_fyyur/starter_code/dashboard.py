@@ -0,0 +1,129 @@
+#----------------------------------------------------------------------------#
+# Home-page dashboard.
+#
+# DashboardCounter holds the totals of venues, artists and shows, the number
+# of shows on each day from today on and the number of venues and artists
+# in each city, so the home page reads a handful of rows by key instead of
+# counting the catalogue.
+#
+# Like UpcomingShow it is kept up to date in the same transaction as the
+# change, by count_rows() with the criteria of the rows written:
+#   - after venues, artists or shows are created (form or import),
+#   - with by=-1 just before venues or artists, and their shows, are deleted,
+#   - move_city() when an edit changes a venue's or artist's city or state.
+# Day counters of past days are never read. "flask refresh-dashboard"
+# recounts everything from the tables, dropping those and correcting any
+# drift (rows written with plain SQL, imports racing other writers); run it
+# from cron once a night.
+#----------------------------------------------------------------------------#
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, literal, select, union_all
+from sqlalchemy.dialects.postgresql import insert
+
+from models import db, Artist, DashboardCounter, Show, Venue
+
+TOTAL, SHOWS_ON, CITY = 'total', 'shows_on', 'city'
+TOTAL_KEYS = {
+    Venue: 'venues',
+    Artist: 'artists',
+    Show: 'shows',
+}
+
+
+def counter_select(kind, key, criteria, by):
+    count = func.count() * by
+    query = select(literal(kind).label('kind'), key.label('key'), count.label('value')).where(*criteria)
+    return query.having(func.count() > 0)
+
+
+def total_select(model, criteria, by):
+    return counter_select(TOTAL, literal(TOTAL_KEYS[model]), criteria, by).select_from(model)
+
+
+def city_select(model, criteria, by):
+    city = func.concat_ws(', ', model.city, model.state)
+    return counter_select(CITY, city, (city != '',) + tuple(criteria), by).group_by(city)
+
+
+def day_key(day):
+    return func.to_char(day, 'YYYY-MM-DD')
+
+
+def shows_on_select(criteria, by):
+    day = day_key(Show.start_time)
+    return counter_select(SHOWS_ON, day, (Show.start_time >= func.current_date(),) + tuple(criteria), by). \
+        group_by(day)
+
+
+def bump(*selects):
+    """Add the (kind, key, value) rows of selects to the counters."""
+    # In key order, so that concurrent writers lock the counter rows they
+    # share in the same order instead of deadlocking.
+    rows = union_all(*selects).order_by('kind', 'key')
+    statement = insert(DashboardCounter).from_select(['kind', 'key', 'value'], rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[DashboardCounter.kind, DashboardCounter.key],
+        set_={'value': DashboardCounter.value + statement.excluded.value, 'updated_at': func.now()})
+    db.session.execute(statement)
+
+
+def count_rows(model, *criteria, by=1):
+    """Count the venues, artists or shows matching criteria in (by=-1: out)."""
+    if model is Show:
+        bump(total_select(model, criteria, by), shows_on_select(criteria, by))
+    else:
+        bump(total_select(model, criteria, by), city_select(model, criteria, by))
+
+
+def move_city(model, row_id):
+    """Move an edited venue or artist from the city in the database to the
+    one set on it in the session; flushes the session."""
+    with db.session.no_autoflush:
+        bump(city_select(model, [model.id == row_id], -1))
+    db.session.flush()
+    bump(city_select(model, [model.id == row_id], 1))
+
+
+def totals():
+    counters = dict(db.session.query(DashboardCounter.key, DashboardCounter.value).
+                    filter(DashboardCounter.kind == TOTAL))
+    return {key: counters.get(key, 0) for key in TOTAL_KEYS.values()}
+
+
+def summary(limit):
+    """Everything the home page shows, read by key or from the top of an index."""
+    counters = db.session.query(DashboardCounter.key, DashboardCounter.value)
+    # The database's date, as in shows_on_select(): the app server's clock
+    # or time zone may put it on another day.
+    week = counters.filter(DashboardCounter.kind == SHOWS_ON, DashboardCounter.key >= day_key(func.current_date()),
+                           DashboardCounter.key < day_key(func.current_date() + 7))
+    cities = counters.filter(DashboardCounter.kind == CITY, DashboardCounter.value > 0). \
+        order_by(DashboardCounter.value.desc(), DashboardCounter.key).limit(limit)
+    newest_venues = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state). \
+        order_by(Venue.id.desc()).limit(limit)
+    newest_artists = db.session.query(Artist.id, Artist.name, Artist.city, Artist.state). \
+        order_by(Artist.id.desc()).limit(limit)
+    return {
+        'totals': totals(),
+        'shows_this_week': sum(value for _, value in week),
+        'top_cities': [{'city': city, 'count': count} for city, count in cities],
+        'newest_venues': newest_venues.all(),
+        'newest_artists': newest_artists.all(),
+    }
+
+
+def rebuild():
+    db.session.execute(delete(DashboardCounter))
+    for model in TOTAL_KEYS:
+        count_rows(model)
+
+
+@click.command('refresh-dashboard')
+@with_appcontext
+def refresh_dashboard():
+    """Recount the home-page dashboard from the tables."""
+    rebuild()
+    db.session.commit()
+    click.echo('{venues} venues, {artists} artists, {shows} shows.'.format(**totals()))
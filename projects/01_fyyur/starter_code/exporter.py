@@ -0,0 +1,126 @@
+#----------------------------------------------------------------------------#
+# Streaming export.
+#
+#   GET /export/venues.csv?updated_since=2020-06-01T00:00:00
+#   $ flask export-catalogue shows --format ndjson --from 2020-06-01 -o shows.ndjson
+#
+# Rows are read through a server-side cursor and written out in chunks, so
+# memory use does not depend on the size of the table.
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+from models import db, Artist, Show, Venue
+from routing import read_engine
+
+ENTITIES = {
+    'venues': Venue,
+    'artists': Artist,
+    'shows': Show,
+}
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+FETCH_SIZE = 2000
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_filter_date(value):
+    """ISO date or datetime from a query string or CLI option; ValueError if malformed."""
+    return datetime.fromisoformat(value) if value else None
+
+
+def parse_end_date(value):
+    # A bare end date includes the whole day.
+    end = parse_filter_date(value)
+    if end is not None and len(value) == len('YYYY-MM-DD'):
+        end += timedelta(days=1)
+    return end
+
+
+def export_columns(model):
+    # Generated columns such as Show.during are derived from the others.
+    return [column for column in model.__table__.columns if column.computed is None]
+
+
+def export_query(entity, updated_since=None, start=None, end=None):
+    model = ENTITIES[entity]
+    table = model.__table__
+    query = select(*export_columns(model)).order_by(table.c.id)
+    if updated_since is not None:
+        query = query.where(table.c.updated_at >= updated_since)
+    if model is Show:
+        if start is not None:
+            query = query.where(table.c.start_time >= start)
+        if end is not None:
+            query = query.where(table.c.start_time < end)
+    return query
+
+
+def export_rows(query):
+    with read_engine(db).connect() as connection:
+        # Exports may legitimately run for longer than a page request.
+        result = connection.execution_options(stream_results=True, max_row_buffer=FETCH_SIZE,
+                                              statement_timeout=0).execute(query)
+        for row in result:
+            yield row._mapping
+
+
+def to_json(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(repr(value))
+
+
+def serialize(rows, columns, fmt):
+    """Yield the export as chunks of roughly CHUNK_SIZE characters."""
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+    for row in rows:
+        if fmt == 'csv':
+            writer.writerow([','.join(value) if isinstance(value, list) else
+                             value.isoformat() if isinstance(value, datetime) else value
+                             for value in (row[column] for column in columns)])
+        else:
+            buffer.write(json.dumps({column: row[column] for column in columns}, default=to_json))
+            buffer.write('\n')
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export(entity, fmt, updated_since=None, start=None, end=None):
+    query = export_query(entity, updated_since, start, end)
+    columns = [column.name for column in export_columns(ENTITIES[entity])]
+    return serialize(export_rows(query), columns, fmt)
+
+
+@click.command('export-catalogue')
+@click.argument('entity', type=click.Choice(sorted(ENTITIES)))
+@click.option('--format', 'fmt', type=click.Choice(sorted(FORMATS)), default='csv', show_default=True)
+@click.option('--updated-since', help='Only rows created or changed since this ISO date/datetime.')
+@click.option('--from', 'start', help='Shows starting on or after this ISO date/datetime.')
+@click.option('--to', 'end', help='Shows starting before the end of this ISO date/datetime.')
+@click.option('-o', '--output', type=click.File('w'), default='-', help='Defaults to stdout.')
+@with_appcontext
+def export_catalogue(entity, fmt, updated_since, start, end, output):
+    """Stream venues, artists or shows as CSV or NDJSON."""
+    try:
+        chunks = export(entity, fmt, parse_filter_date(updated_since), parse_filter_date(start), parse_end_date(end))
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    for chunk in chunks:
+        output.write(chunk)
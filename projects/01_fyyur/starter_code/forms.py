@@ -1,21 +1,42 @@
 from datetime import datetime
 from flask_wtf import FlaskForm
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL, InputRequired, NumberRange, Optional
+
+
+# Largest value of an integer (int4) primary key.
+MAX_ID = 2 ** 31 - 1
+MAX_DURATION_MINUTES = 24 * 60
 
 
 class ShowForm(FlaskForm):
-    artist_id = StringField(
-        'artist_id'
+    artist_id = IntegerField(
+        'artist_id', validators=[InputRequired(), NumberRange(min=1, max=MAX_ID)]
     )
-    venue_id = StringField(
-        'venue_id'
+    venue_id = IntegerField(
+        'venue_id', validators=[InputRequired(), NumberRange(min=1, max=MAX_ID)]
     )
     start_time = DateTimeField(
         'start_time',
-        validators=[DataRequired()],
+        validators=[InputRequired()],
         default=datetime.today()
     )
+    duration_minutes = IntegerField(
+        'duration_minutes',
+        validators=[Optional(), NumberRange(min=1, max=MAX_DURATION_MINUTES)],
+        default=120
+    )
+
+
+class ImportShowForm(ShowForm):
+    # Imported shows may name their artist and venue instead (see
+    # importer.py), which then resolves and checks the references.
+    artist_id = IntegerField(
+        'artist_id', validators=[Optional(), NumberRange(min=1, max=MAX_ID)]
+    )
+    venue_id = IntegerField(
+        'venue_id', validators=[Optional(), NumberRange(min=1, max=MAX_ID)]
+    )
 
 
 class VenueForm(FlaskForm):
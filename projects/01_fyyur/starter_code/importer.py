@@ -0,0 +1,257 @@
+#----------------------------------------------------------------------------#
+# Bulk import.
+#
+#   $ flask import-catalogue venues partner_venues.csv
+#   $ flask import-catalogue shows partner_shows.jsonl --resume
+#
+# Rows are streamed from CSV or JSON Lines, validated with the forms in
+# forms.py and loaded with COPY in batches, one transaction per batch.
+# After each batch the input line reached is written to a checkpoint file so
+# that an interrupted import can be resumed with --resume. Rejected rows and
+# their errors are written to <input>.rejected.jsonl. A batch the database
+# refuses (a double booking, a reference deleted meanwhile) is rolled back to
+# a savepoint and loaded row by row, rejecting the rows that fail with the
+# constraint they violate.
+#
+# Shows reference their artist and venue either by id (artist_id, venue_id)
+# or by natural key: artist_name, and venue_name + venue_city + venue_state.
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+import os
+import time
+
+import click
+import psycopg2
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func
+from werkzeug.datastructures import MultiDict
+
+from forms import ArtistForm, ImportShowForm, VenueForm
+from models import db, Artist, Show, Venue
+import dashboard
+import upcoming
+
+ENTITIES = {
+    'venues': (Venue, VenueForm),
+    'artists': (Artist, ArtistForm),
+    'shows': (Show, ImportShowForm),
+}
+
+
+def read_rows(path, fmt):
+    """Yield (line number, row dict) pairs without reading the whole file."""
+    with open(path, newline='') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                if row.get('genres'):
+                    row['genres'] = [genre.strip() for genre in row['genres'].split(',')]
+                yield reader.line_num, row
+        else:
+            for line_num, line in enumerate(f, 1):
+                if line.strip():
+                    yield line_num, json.loads(line)
+
+
+def form_data(row):
+    data = MultiDict()
+    for key, value in row.items():
+        if isinstance(value, list):
+            data.setlist(key, [str(item) for item in value])
+        elif isinstance(value, bool):
+            data[key] = 'y' if value else ''
+        elif value is not None:
+            data[key] = str(value)
+    return data
+
+
+class ReferenceResolver(object):
+    """Natural key -> id maps for artists and venues, loaded once per import.
+
+    Names that are not unique resolve to None so the row is rejected rather
+    than attached to an arbitrary namesake.
+    """
+
+    def __init__(self):
+        self.artists, self.artist_ids = self._index(db.session.query(Artist.name, Artist.id))
+        self.venues, self.venue_ids = self._index(db.session.query(Venue.name, Venue.city, Venue.state, Venue.id))
+
+    @staticmethod
+    def _index(query):
+        index, ids = {}, set()
+        for row in query.yield_per(10000):
+            key = tuple(row[:-1])
+            index[key] = None if key in index else row[-1]
+            ids.add(row[-1])
+        return index, ids
+
+    @staticmethod
+    def _resolve(explicit_id, known_ids, by_key, name, errors):
+        if explicit_id in (None, ''):
+            if by_key is None:
+                errors[name] = ['Unknown or ambiguous {}'.format(name)]
+            return by_key or 0
+        try:
+            resolved = int(explicit_id)
+        except (TypeError, ValueError):
+            errors[name] = ['Not a valid {} id: {!r}'.format(name, explicit_id)]
+            return 0
+        if resolved not in known_ids:
+            errors[name] = ['Unknown {} id {}'.format(name, resolved)]
+        return resolved
+
+    def resolve(self, row):
+        errors = {}
+        artist_id = self._resolve(row.get('artist_id'), self.artist_ids,
+                                  self.artists.get((row.get('artist_name'),)), 'artist', errors)
+        venue_id = self._resolve(row.get('venue_id'), self.venue_ids, self.venues.get(
+            (row.get('venue_name'), row.get('venue_city'), row.get('venue_state'))), 'venue', errors)
+        return artist_id, venue_id, errors
+
+
+def copy_rows(model, columns, rows):
+    """Load rows with a single COPY ... FROM STDIN on the current transaction."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([to_copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert('COPY "{}" ({}) FROM STDIN WITH (FORMAT csv)'.format(
+        model.__tablename__, ', '.join(columns)), buffer)
+
+
+def to_copy_value(value):
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, list):
+        return '{' + ','.join('"{}"'.format(item.replace('\\', '\\\\').replace('"', '\\"'))
+                              for item in value) + '}'
+    return value
+
+
+def database_error(error):
+    name = getattr(error.diag, 'constraint_name', None)
+    return {'database': [name or (error.pgerror or str(error)).strip().splitlines()[0]]}
+
+
+def copy_batch(model, columns, batch):
+    """COPY the (line, row, values) entries of batch under a savepoint;
+    when the database refuses it, load them one by one instead. Returns
+    the entries rejected, each with its errors."""
+    try:
+        with db.session.begin_nested():
+            copy_rows(model, columns, [values for _, _, values in batch])
+        return []
+    except (psycopg2.IntegrityError, psycopg2.DataError):
+        pass
+    failed = []
+    for entry in batch:
+        try:
+            with db.session.begin_nested():
+                copy_rows(model, columns, [entry[2]])
+        except (psycopg2.IntegrityError, psycopg2.DataError) as e:
+            failed.append(entry + (database_error(e),))
+    return failed
+
+
+def trim_rejected(rejected_path, line):
+    """Forget the rejections after line, which a resumed import reads again."""
+    if not os.path.exists(rejected_path):
+        return
+    with open(rejected_path) as f:
+        kept = [entry for entry in f if entry.strip() and json.loads(entry)['line'] <= line]
+    with open(rejected_path, 'w') as f:
+        f.writelines(kept)
+
+
+def import_rows(entity, path, fmt, batch_size=5000, resume=False, echo=print):
+    model, form_class = ENTITIES[entity]
+    checkpoint_path = path + '.checkpoint'
+    rejected_path = path + '.rejected.jsonl'
+    start_line = 0
+    if resume and os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as f:
+            start_line = json.load(f)['line']
+        trim_rejected(rejected_path, start_line)
+
+    resolver = ReferenceResolver() if entity == 'shows' else None
+    columns = None
+    report = {'loaded': 0, 'rejected': 0, 'line': start_line}
+    batch = []
+    touched = set()
+    started = time.time()
+
+    def flush(line_num):
+        failed = []
+        if batch:
+            # COPY returns no ids; pick the new rows up by id instead.
+            # Anything a concurrent writer added is merely refreshed in
+            # UpcomingShow, and counted twice until the dashboard is rebuilt.
+            last_id = db.session.query(func.max(model.id)).scalar() or 0
+            failed = copy_batch(model, columns, batch)
+            if model is Show:
+                upcoming.add_shows(Show.id > last_id)
+            dashboard.count_rows(model, model.id > last_id)
+        db.session.commit()
+        for failed_line, row, _, errors in failed:
+            reject(failed_line, row, errors)
+        rejected.flush()
+        report['loaded'] += len(batch) - len(failed)
+        report['line'] = line_num
+        with open(checkpoint_path, 'w') as f:
+            json.dump(report, f)
+        echo('{loaded} rows loaded, {rejected} rejected, line {line} '
+             '({rate:.0f} rows/s)'.format(rate=report['loaded'] / max(time.time() - started, 1e-6), **report))
+        del batch[:]
+
+    def reject(line_num, row, errors):
+        report['rejected'] += 1
+        rejected.write(json.dumps({'line': line_num, 'row': row, 'errors': errors}, default=str) + '\n')
+
+    with open(rejected_path, 'a' if resume else 'w') as rejected:
+        line_num = start_line
+        for line_num, row in read_rows(path, fmt):
+            if line_num <= start_line:
+                continue
+            form = form_class(formdata=form_data(row), meta={'csrf': False})
+            errors = {} if form.validate() else dict(form.errors)
+            values = dict(form.data)
+            if resolver is not None:
+                values['artist_id'], values['venue_id'], reference_errors = resolver.resolve(row)
+                errors.update(reference_errors)
+            if errors:
+                reject(line_num, row, errors)
+                continue
+            columns = columns or sorted(values)
+            batch.append((line_num, row, values))
+            if entity == 'shows':
+                touched.update(('venue:{}'.format(values['venue_id']), 'artist:{}'.format(values['artist_id'])))
+            if len(batch) >= batch_size:
+                flush(line_num)
+        flush(line_num)
+
+    page_cache = current_app.extensions.get('page_cache')
+    if page_cache is not None:
+        page_cache.invalidate(entity, *touched)
+    report['seconds'] = time.time() - started
+    return report
+
+
+@click.command('import-catalogue')
+@click.argument('entity', type=click.Choice(sorted(ENTITIES)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+              help='Input format; guessed from the file extension by default.')
+@click.option('--batch-size', default=5000, show_default=True)
+@click.option('--resume', is_flag=True, help='Continue after the line recorded in <path>.checkpoint.')
+@with_appcontext
+def import_catalogue(entity, path, fmt, batch_size, resume):
+    """Bulk load venues, artists or shows from CSV or JSON Lines."""
+    fmt = fmt or ('csv' if path.endswith('.csv') else 'jsonl')
+    report = import_rows(entity, path, fmt, batch_size, resume, echo=click.echo)
+    click.echo('Done: {loaded} rows loaded and {rejected} rejected in {seconds:.1f}s.'.format(**report))
@@ -0,0 +1,47 @@
+"""dashboard counters
+
+Revision ID: 3d7f2b8e6a51
+Revises: b8e4d17c5f02
+Create Date: 2026-10-18 17:41:09.528310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d7f2b8e6a51'
+down_revision = 'b8e4d17c5f02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('DashboardCounter',
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('key', sa.String(length=250), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('kind', 'key')
+    )
+    op.create_index('ix_DashboardCounter_kind_value', 'DashboardCounter', ['kind', 'value'], unique=False)
+    op.execute('''
+        INSERT INTO "DashboardCounter" (kind, key, value)
+        SELECT 'total', 'venues', count(*) FROM "Venue"
+        UNION ALL SELECT 'total', 'artists', count(*) FROM "Artist"
+        UNION ALL SELECT 'total', 'shows', count(*) FROM "Show"
+        UNION ALL
+        SELECT 'shows_on', to_char(start_time, 'YYYY-MM-DD'), count(*) FROM "Show"
+        WHERE start_time >= current_date GROUP BY 1, 2
+        UNION ALL
+        SELECT 'city', city, count(*) FROM (
+            SELECT concat_ws(', ', city, state) AS city FROM "Venue"
+            UNION ALL SELECT concat_ws(', ', city, state) FROM "Artist"
+        ) AS listings
+        WHERE city != '' GROUP BY 1, 2
+    ''')
+
+
+def downgrade():
+    op.drop_index('ix_DashboardCounter_kind_value', table_name='DashboardCounter')
+    op.drop_table('DashboardCounter')
@@ -0,0 +1,34 @@
+"""name search indexes
+
+Revision ID: 8c3e5a1f6d20
+Revises: 4f1d2c9a7b3e
+Create Date: 2026-10-18 10:03:17.842260
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c3e5a1f6d20'
+down_revision = '4f1d2c9a7b3e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('Venue', 'Artist'):
+        # Trigram index: serves ILIKE '%term%' and the % similarity operator.
+        op.create_index('ix_{}_name_trgm'.format(table.lower()), table, ['name'],
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        # Full-text index: must match the expression used by search_query() in app.py.
+        op.create_index('ix_{}_name_tsv'.format(table.lower()), table,
+                        [sa.text("to_tsvector('simple', coalesce(name, ''))")],
+                        postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        op.drop_index('ix_{}_name_tsv'.format(table.lower()), table_name=table)
+        op.drop_index('ix_{}_name_trgm'.format(table.lower()), table_name=table)
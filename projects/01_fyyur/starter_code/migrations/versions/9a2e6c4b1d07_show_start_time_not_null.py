@@ -0,0 +1,32 @@
+"""show start_time not null
+
+Revision ID: 9a2e6c4b1d07
+Revises: 3d7f2b8e6a51
+Create Date: 2026-10-18 21:48:36.207914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a2e6c4b1d07'
+down_revision = '3d7f2b8e6a51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A show without a start time is on no page and breaks the /shows
+    # cursor; the form and the importer never wrote one. Drop any left over
+    # and take them out of the dashboard total.
+    op.execute('''
+        WITH removed AS (DELETE FROM "Show" WHERE start_time IS NULL RETURNING 1)
+        UPDATE "DashboardCounter" SET value = value - (SELECT count(*) FROM removed)
+        WHERE kind = 'total' AND key = 'shows'
+    ''')
+    op.alter_column('Show', 'start_time', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    op.alter_column('Show', 'start_time', existing_type=sa.DateTime(), nullable=True)
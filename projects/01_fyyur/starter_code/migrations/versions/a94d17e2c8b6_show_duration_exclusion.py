@@ -0,0 +1,47 @@
+"""show duration and double-booking constraints
+
+Revision ID: a94d17e2c8b6
+Revises: f3c8a2d5e617
+Create Date: 2026-10-18 16:47:05.215630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a94d17e2c8b6'
+down_revision = 'f3c8a2d5e617'
+branch_labels = None
+depends_on = None
+
+DURING = "tsrange(start_time, start_time + duration_minutes * interval '1 minute')"
+
+
+def upgrade():
+    # btree_gist provides the integer "=" in a GiST index next to the range "&&".
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.add_column('Show', sa.Column('duration_minutes', sa.Integer(), server_default='120', nullable=False))
+    op.add_column('Show', sa.Column('during', postgresql.TSRANGE(), sa.Computed(DURING, persisted=True), nullable=True))
+
+    clashes = op.get_bind().execute(sa.text('''
+        SELECT a.id, b.id FROM "Show" a JOIN "Show" b
+          ON a.id < b.id AND a.during && b.during AND (a.artist_id = b.artist_id OR a.venue_id = b.venue_id)
+        ORDER BY a.id, b.id LIMIT 20
+    ''')).fetchall()
+    if clashes:
+        raise RuntimeError('Resolve these double-booked shows before upgrading: ' +
+                           ', '.join('{} and {}'.format(*pair) for pair in clashes))
+
+    op.create_exclude_constraint('ex_Show_artist_during', 'Show', ('artist_id', '='), ('during', '&&'),
+                                 using='gist')
+    op.create_exclude_constraint('ex_Show_venue_during', 'Show', ('venue_id', '='), ('during', '&&'),
+                                 using='gist')
+
+
+def downgrade():
+    op.drop_constraint('ex_Show_venue_during', 'Show')
+    op.drop_constraint('ex_Show_artist_during', 'Show')
+    op.drop_column('Show', 'during')
+    op.drop_column('Show', 'duration_minutes')
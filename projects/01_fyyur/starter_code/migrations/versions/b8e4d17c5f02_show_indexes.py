@@ -0,0 +1,37 @@
+"""show indexes
+
+Revision ID: b8e4d17c5f02
+Revises: c6d1f9e27a43
+Create Date: 2026-10-18 20:14:05.316284
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4d17c5f02'
+down_revision = 'c6d1f9e27a43'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_Show_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_Show_artist_id_start_time', ['artist_id', 'start_time']),
+    ('ix_Show_start_time_id', ['start_time', 'id']),
+]
+
+
+def upgrade():
+    # CONCURRENTLY keeps Show writable while the indexes build, but cannot
+    # run inside a transaction. A build that fails leaves an INVALID index
+    # behind; drop it before running the upgrade again.
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, 'Show', columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='Show', postgresql_concurrently=True)
@@ -0,0 +1,26 @@
+"""edit versions
+
+Revision ID: c6d1f9e27a43
+Revises: a94d17e2c8b6
+Create Date: 2026-10-18 19:02:11.480532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6d1f9e27a43'
+down_revision = 'a94d17e2c8b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'version')
@@ -0,0 +1,25 @@
+"""artist name keyset index
+
+Revision ID: d2a6f83b19c4
+Revises: b71e0d4c2a95
+Create Date: 2026-10-18 12:08:33.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a6f83b19c4'
+down_revision = 'b71e0d4c2a95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Serves the (name, id) ordering and cursor comparison of /artists.
+    op.create_index('ix_Artist_name_id', 'Artist', ['name', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Artist_name_id', table_name='Artist')
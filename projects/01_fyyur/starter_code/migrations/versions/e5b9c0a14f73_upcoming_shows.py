@@ -0,0 +1,51 @@
+"""upcoming shows
+
+Revision ID: e5b9c0a14f73
+Revises: d2a6f83b19c4
+Create Date: 2026-10-18 14:02:17.384215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b9c0a14f73'
+down_revision = 'd2a6f83b19c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('UpcomingShow',
+    sa.Column('show_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('artist_name', sa.String(), nullable=True),
+    sa.Column('artist_image_link', sa.String(length=500), nullable=True),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('venue_name', sa.String(), nullable=True),
+    sa.Column('venue_image_link', sa.String(length=500), nullable=True),
+    sa.Column('city', sa.String(length=120), nullable=True),
+    sa.Column('state', sa.String(length=120), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['show_id'], ['Show.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('show_id')
+    )
+    op.create_index('ix_UpcomingShow_start_time_show_id', 'UpcomingShow', ['start_time', 'show_id'], unique=False)
+    op.create_index('ix_UpcomingShow_venue_id_start_time', 'UpcomingShow', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_UpcomingShow_artist_id_start_time', 'UpcomingShow', ['artist_id', 'start_time'], unique=False)
+    op.execute('''
+        INSERT INTO "UpcomingShow" (show_id, start_time, artist_id, artist_name, artist_image_link,
+                                    venue_id, venue_name, venue_image_link, city, state)
+        SELECT s.id, s.start_time, s.artist_id, a.name, a.image_link, s.venue_id, v.name, v.image_link, v.city, v.state
+        FROM "Show" s JOIN "Artist" a ON a.id = s.artist_id JOIN "Venue" v ON v.id = s.venue_id
+        WHERE s.start_time >= now()
+    ''')
+
+
+def downgrade():
+    op.drop_index('ix_UpcomingShow_artist_id_start_time', table_name='UpcomingShow')
+    op.drop_index('ix_UpcomingShow_venue_id_start_time', table_name='UpcomingShow')
+    op.drop_index('ix_UpcomingShow_start_time_show_id', table_name='UpcomingShow')
+    op.drop_table('UpcomingShow')
@@ -0,0 +1,27 @@
+"""genre indexes
+
+Revision ID: f3c8a2d5e617
+Revises: e5b9c0a14f73
+Create Date: 2026-10-18 15:21:40.903118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c8a2d5e617'
+down_revision = 'e5b9c0a14f73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Serve the @> (all of) and && (any of) genre filters.
+    op.create_index('ix_Venue_genres', 'Venue', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_Artist_genres', 'Artist', ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_Artist_genres', table_name='Artist')
+    op.drop_index('ix_Venue_genres', table_name='Venue')
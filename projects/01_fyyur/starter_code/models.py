@@ -0,0 +1,143 @@
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects import postgresql
+
+from routing import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# The name search indexes need pg_trgm and the Show exclusion constraints
+# btree_gist. The migrations create both; this does it for create_all().
+event.listen(db.metadata, 'before_create', DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+event.listen(db.metadata, 'before_create', DDL('CREATE EXTENSION IF NOT EXISTS btree_gist'))
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+        # Name search, see search_query() in app.py: ILIKE and the similarity
+        # operator use the trigram index, full-text matches the tsvector one.
+        db.Index('ix_venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_venue_name_tsv', db.text("to_tsvector('simple', coalesce(name, ''))"), postgresql_using='gin'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    genres = db.Column(postgresql.ARRAY(db.String))
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    website = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    seeking_talent = db.Column(db.Boolean)
+    seeking_description = db.Column(db.String(120))
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), onupdate=db.func.now(), index=True)
+    # Bumped by every UPDATE, which also checks it, so that concurrent edits conflict.
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    show = db.relationship('Show', passive_deletes=True, backref='Venue', lazy=True)
+
+    __mapper_args__ = {'version_id_col': version}
+
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_name_id', 'name', 'id'),
+        db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+        # Name search, as on Venue.
+        db.Index('ix_artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_artist_name_tsv', db.text("to_tsvector('simple', coalesce(name, ''))"), postgresql_using='gin'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    website = db.Column(db.String(120))
+    genres = db.Column(postgresql.ARRAY(db.String))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    seeking_venue = db.Column(db.Boolean)
+    seeking_description = db.Column(db.String(120))
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), onupdate=db.func.now(), index=True)
+    # Bumped by every UPDATE, which also checks it, so that concurrent edits conflict.
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    show = db.relationship('Show', passive_deletes=True, backref='Artist', lazy=True)
+
+    __mapper_args__ = {'version_id_col': version}
+
+
+class Show(db.Model):
+    __tablename__ = 'Show'
+    # No artist or venue can be booked for two overlapping shows. The GiST
+    # indexes behind these constraints also serve the availability checks.
+    __table_args__ = (
+        postgresql.ExcludeConstraint(('artist_id', '='), ('during', '&&'),
+                                     name='ex_Show_artist_during', using='gist'),
+        postgresql.ExcludeConstraint(('venue_id', '='), ('during', '&&'),
+                                     name='ex_Show_venue_during', using='gist'),
+        # Detail pages: one side's shows before or after now, by start time.
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        # /shows reaching into the past: the (start_time, id) keyset.
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'))
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'))
+    start_time = db.Column(db.DateTime, nullable=False)
+    duration_minutes = db.Column(db.Integer, nullable=False, server_default='120')
+    during = db.Column(postgresql.TSRANGE, db.Computed(
+        "tsrange(start_time, start_time + duration_minutes * interval '1 minute')", persisted=True))
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), onupdate=db.func.now(), index=True)
+
+
+class UpcomingShow(db.Model):
+    """Shows that have not started yet, joined with their artist and venue.
+
+    Maintained by upcoming.py; rows of deleted shows go with them.
+    """
+    __tablename__ = 'UpcomingShow'
+    __table_args__ = (
+        db.Index('ix_UpcomingShow_start_time_show_id', 'start_time', 'show_id'),
+        db.Index('ix_UpcomingShow_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_UpcomingShow_artist_id_start_time', 'artist_id', 'start_time'),
+    )
+
+    show_id = db.Column(db.Integer, db.ForeignKey('Show.id', ondelete='CASCADE'), primary_key=True)
+    start_time = db.Column(db.DateTime, nullable=False)
+    artist_id = db.Column(db.Integer, nullable=False)
+    artist_name = db.Column(db.String)
+    artist_image_link = db.Column(db.String(500))
+    venue_id = db.Column(db.Integer, nullable=False)
+    venue_name = db.Column(db.String)
+    venue_image_link = db.Column(db.String(500))
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), onupdate=db.func.now())
+
+
+class DashboardCounter(db.Model):
+    """Home-page totals, shows per day and listings per city.
+
+    Maintained by dashboard.py; kind is 'total' (key 'venues', 'artists' or
+    'shows'), 'shows_on' (key an ISO date) or 'city' (key "City, ST").
+    """
+    __tablename__ = 'DashboardCounter'
+    __table_args__ = (
+        db.Index('ix_DashboardCounter_kind_value', 'kind', 'value'),
+    )
+
+    kind = db.Column(db.String(20), primary_key=True)
+    key = db.Column(db.String(250), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), onupdate=db.func.now())
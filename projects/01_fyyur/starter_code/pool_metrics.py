@@ -0,0 +1,121 @@
+#----------------------------------------------------------------------------#
+# Connection pool metrics.
+#
+# config.py sets TimedQueuePool as the engine's pool class. It records how
+# long every checkout took, how many had to wait for a connection to be
+# returned and how many timed out. pool_report() combines those counters with
+# the pool's own gauges; it is served at /_stats/pool with STATS_ENABLED set,
+# and "flask pool-stats" shows the server-side view from pg_stat_activity.
+#
+# A statement can override the configured statement_timeout with the
+# statement_timeout execution option (milliseconds, 0 disables it).
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+from collections import deque
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from models import db
+
+
+class CheckoutStats(object):
+
+    def __init__(self, window=1000):
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, waited, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.recent.append(seconds)
+            if waited:
+                self.waits += 1
+                self.wait_seconds += seconds
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            recent = sorted(self.recent)
+            report = {
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'wait_ms_total': round(self.wait_seconds * 1000, 3),
+            }
+        for name, fraction in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99)):
+            value = recent[min(len(recent) - 1, int(fraction * len(recent)))] if recent else 0.0
+            report['checkout_ms_' + name] = round(value * 1000, 3)
+        report['checkout_ms_max'] = round(recent[-1] * 1000, 3) if recent else 0.0
+        return report
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that times each checkout."""
+
+    def __init__(self, *args, **kwargs):
+        super(TimedQueuePool, self).__init__(*args, **kwargs)
+        self.checkout_stats = CheckoutStats()
+
+    def recreate(self):
+        pool = super(TimedQueuePool, self).recreate()
+        pool.checkout_stats = self.checkout_stats
+        return pool
+
+    def _do_get(self):
+        # No idle connection and no overflow left: this checkout has to wait.
+        waited = self._pool.empty() and self._max_overflow > -1 and self._overflow >= self._max_overflow
+        started = time.perf_counter()
+        try:
+            connection = super(TimedQueuePool, self)._do_get()
+        except exc.TimeoutError:
+            self.checkout_stats.record(time.perf_counter() - started, True, timed_out=True)
+            raise
+        self.checkout_stats.record(time.perf_counter() - started, waited)
+        return connection
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def apply_statement_timeout(conn, cursor, statement, parameters, context, executemany):
+    options = context.execution_options if context is not None else conn.get_execution_options()
+    timeout = options.get('statement_timeout')
+    if timeout is not None:
+        # A separate cursor, as the statement's own may be a server-side one.
+        setter = conn.connection.cursor()
+        setter.execute('SET LOCAL statement_timeout = %s', (int(timeout),))
+        setter.close()
+
+
+def pool_report(engine):
+    pool = engine.pool
+    report = {
+        'pool_class': type(pool).__name__,
+        'size': pool.size() if hasattr(pool, 'size') else None,
+        'checked_out': pool.checkedout() if hasattr(pool, 'checkedout') else None,
+        'idle': pool.checkedin() if hasattr(pool, 'checkedin') else None,
+        'overflow': pool.overflow() if hasattr(pool, 'overflow') else None,
+    }
+    if hasattr(pool, 'checkout_stats'):
+        report.update(pool.checkout_stats.snapshot())
+    return report
+
+
+@click.command('pool-stats')
+@with_appcontext
+def pool_stats():
+    """Show this database's server-side connections by application and state."""
+    rows = db.session.execute(text(
+        'SELECT application_name, state, count(*) FROM pg_stat_activity '
+        'WHERE datname = current_database() GROUP BY 1, 2 ORDER BY 1, 2'))
+    for application_name, state, count in rows:
+        click.echo('{:<30} {:<30} {:>5}'.format(application_name or '-', state or '-', count))
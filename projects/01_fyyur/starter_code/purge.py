@@ -0,0 +1,114 @@
+#----------------------------------------------------------------------------#
+# Bulk delete.
+#
+#   POST /api/v1/venues/delete  {"ids": [3, 4, 5]}   (Authorization: Bearer <BULK_DELETE_TOKEN>)
+#   $ flask purge-catalogue artists --updated-before 2020-01-01
+#   $ flask purge-catalogue venues --ids 3,4,5 --yes
+#
+# Venues and artists are removed with one DELETE ... WHERE id IN (...) per
+# batch, one transaction per batch, without loading anything into the
+# session: their shows, and those shows' UpcomingShow rows, go with them
+# through the ON DELETE CASCADE foreign keys. The shows are counted (and the
+# other side of each noted for the page cache), and the rows counted out of
+# the dashboard, just before each batch.
+#----------------------------------------------------------------------------#
+
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func
+
+import dashboard
+from exporter import parse_filter_date
+from models import db, Artist, Show, Venue
+
+ENTITIES = {
+    'venues': Venue,
+    'artists': Artist,
+}
+# model: (its key on Show, the other side's key, the other side's cache tag)
+SHOW_KEYS = {
+    Venue: (Show.venue_id, Show.artist_id, 'artist'),
+    Artist: (Show.artist_id, Show.venue_id, 'venue'),
+}
+
+
+def chunks(ids, size):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def matching_ids(model, criteria, batch_size):
+    # Keyset over the ids, so each batch is read after the previous one was
+    # deleted and committed.
+    last_id = 0
+    while True:
+        ids = [row_id for row_id, in db.session.query(model.id).filter(model.id > last_id, *criteria).
+               order_by(model.id).limit(batch_size)]
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def delete_batch(model, ids):
+    """Delete the rows with ids; returns (rows deleted, shows deleted, ids on the other side of those shows)."""
+    owner_key, other_key, _ = SHOW_KEYS[model]
+    counts = db.session.query(other_key, func.count()).filter(owner_key.in_(ids)).group_by(other_key).all()
+    dashboard.count_rows(Show, owner_key.in_(ids), by=-1)
+    dashboard.count_rows(model, model.id.in_(ids), by=-1)
+    result = db.session.execute(delete(model).where(model.id.in_(ids)).
+                                execution_options(synchronize_session=False))
+    return result.rowcount, sum(count for _, count in counts), [other_id for other_id, _ in counts]
+
+
+def delete_rows(entity, ids=None, criteria=(), batch_size=1000, echo=None):
+    """Delete the venues or artists with ids, or else those matching criteria."""
+    model = ENTITIES[entity]
+    tag = entity[:-1]
+    other_tag = SHOW_KEYS[model][2]
+    batches = chunks(sorted(set(ids)), batch_size) if ids is not None else matching_ids(model, criteria, batch_size)
+    report = {'deleted': 0, 'shows_deleted': 0, 'batches': 0}
+    tags = {entity, 'shows'}
+    started = time.time()
+
+    for batch in batches:
+        deleted, shows, others = delete_batch(model, batch)
+        db.session.commit()
+        report['deleted'] += deleted
+        report['shows_deleted'] += shows
+        report['batches'] += 1
+        tags.update('{}:{}'.format(tag, row_id) for row_id in batch)
+        tags.update('{}:{}'.format(other_tag, other_id) for other_id in others)
+        if echo is not None:
+            echo('{deleted} {entity} and {shows_deleted} shows deleted'.format(entity=entity, **report))
+
+    page_cache = current_app.extensions.get('page_cache')
+    if page_cache is not None and report['deleted']:
+        page_cache.invalidate(*tags)
+    report['seconds'] = time.time() - started
+    return report
+
+
+@click.command('purge-catalogue')
+@click.argument('entity', type=click.Choice(sorted(ENTITIES)))
+@click.option('--ids', help='Comma-separated ids to delete.')
+@click.option('--updated-before', help='Delete every row not created or changed since this ISO date/datetime.')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.confirmation_option('--yes', prompt='Delete these rows and all of their shows?')
+@with_appcontext
+def purge_catalogue(entity, ids, updated_before, batch_size):
+    """Delete venues or artists, and their shows, in batches."""
+    if (ids is None) == (updated_before is None):
+        raise click.UsageError('Give exactly one of --ids and --updated-before.')
+    model = ENTITIES[entity]
+    try:
+        ids = [int(row_id) for row_id in ids.split(',') if row_id.strip()] if ids is not None else None
+        criteria = [model.updated_at < parse_filter_date(updated_before)] if updated_before is not None else []
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    report = delete_rows(entity, ids=ids, criteria=criteria, batch_size=batch_size, echo=click.echo)
+    click.echo('Done: {deleted} {entity} and {shows_deleted} shows deleted in {batches} batches '
+               '({seconds:.1f}s).'.format(entity=entity, **report))
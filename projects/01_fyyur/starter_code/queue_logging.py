@@ -0,0 +1,234 @@
+#----------------------------------------------------------------------------#
+# Non-blocking logging.
+#
+#   queue_logging = QueueLogging(app)   # or QueueLogging().init_app(app)
+#
+# Outside debug mode app.logger gets a RequestQueueHandler, which only puts
+# records on an in-memory queue; a QueueListener thread takes them off and
+# writes them to stderr, as Flask does, and to LOG_FILE, rotated when it
+# reaches LOG_MAX_BYTES with LOG_BACKUP_COUNT old files kept. A slow disk
+# therefore delays the log, not the request. When the queue holds
+# LOG_QUEUE_SIZE records further ones are dropped and counted rather than
+# waited for.
+#
+# LOG_FORMAT=json writes one JSON object per line. Records logged during a
+# request carry its endpoint, method and path. INFO and lower records of an
+# endpoint are kept at the rate given for it in LOG_SAMPLE_RATES, else at
+# LOG_SAMPLE_RATE; warnings and errors always are. A sampled record carries
+# its rate, to weigh it back up by.
+#
+# Settings are read from the app config or the environment; in the latter
+# LOG_SAMPLE_RATES is a list like "venues=0.1,show_venue=0.5". The listener
+# is restarted in processes forked after init_app() (gunicorn --preload) and
+# drained at exit. Worker processes do not coordinate their rotations: with
+# more than one, set LOG_MAX_BYTES=0 and rotate LOG_FILE with logrotate's
+# copytruncate instead.
+#----------------------------------------------------------------------------#
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import weakref
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import current_app, has_request_context, request
+from flask.logging import default_handler
+
+DEFAULTS = {
+    'LOG_FILE': 'error.log',
+    'LOG_FORMAT': 'text',
+    'LOG_LEVEL': 'INFO',
+    'LOG_MAX_BYTES': 10 * 1024 * 1024,
+    'LOG_BACKUP_COUNT': 5,
+    'LOG_QUEUE_SIZE': 10000,
+    'LOG_SAMPLE_RATE': 1.0,
+    'LOG_SAMPLE_RATES': {},
+}
+TEXT_FORMAT = '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
+REQUEST_FIELDS = ('endpoint', 'method', 'path')
+
+# Every LogQueue with a listener; the exit and fork hooks below are
+# registered once per process and act on all of them.
+_instances = weakref.WeakSet()
+
+
+def _stop_all():
+    for instance in list(_instances):
+        instance.stop()
+
+
+def _restart_all():
+    for instance in list(_instances):
+        instance._restart()
+
+
+atexit.register(_stop_all)
+os.register_at_fork(after_in_child=_restart_all)
+
+
+class JSONFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pathname': record.pathname,
+            'lineno': record.lineno,
+        }
+        for field in REQUEST_FIELDS + ('sample_rate',):
+            if getattr(record, field, None) is not None:
+                entry[field] = getattr(record, field)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RouteSampler(logging.Filter):
+    """Keeps INFO and lower records of each endpoint at its sample rate."""
+
+    def __init__(self, rate=1.0, rates=None):
+        super(RouteSampler, self).__init__()
+        self.rate = rate
+        self.rates = dict(rates or {})
+        self.sampled_out = 0
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        endpoint = request.endpoint if has_request_context() else None
+        rate = self.rates.get(endpoint, self.rate)
+        if rate >= 1:
+            return True
+        if random.random() >= rate:
+            self.sampled_out += 1
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class RequestQueueHandler(QueueHandler):
+    """Queues records with their message merged, their traceback formatted
+    and the current request attached, all on the caller's thread."""
+
+    def __init__(self, log_queue):
+        super(RequestQueueHandler, self).__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if has_request_context():
+            record.endpoint, record.method, record.path = request.endpoint, request.method, request.path
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class QueueLogging(object):
+    """Gives each app its own LogQueue, in app.extensions['queue_logging']."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['queue_logging'] = LogQueue(app)
+
+    def stats(self):
+        return current_app.extensions['queue_logging'].stats()
+
+
+class LogQueue(object):
+    """One app's logging settings, queue handler and listener."""
+
+    def __init__(self, app):
+        self.handler = None
+        self.listener = None
+        self.running = False
+        self._lock = threading.Lock()
+        for name, default in DEFAULTS.items():
+            value = app.config.get(name, os.environ.get(name, default))
+            if isinstance(default, float) and isinstance(value, str):
+                value = float(value)
+            elif isinstance(default, int) and isinstance(value, str):
+                value = int(value)
+            elif isinstance(default, dict) and isinstance(value, str):
+                value = {endpoint.strip(): float(rate) for endpoint, rate in
+                         (item.split('=', 1) for item in value.split(',') if item.strip())}
+            setattr(self, name[len('LOG_'):].lower(), value)
+        if app.debug:
+            return
+
+        file_handler = RotatingFileHandler(self.file, maxBytes=self.max_bytes, backupCount=self.backup_count,
+                                           delay=True)
+        file_handler.setFormatter(JSONFormatter() if self.format == 'json' else logging.Formatter(TEXT_FORMAT))
+        self.handler = RequestQueueHandler(queue.Queue(self.queue_size))
+        self.handler.addFilter(RouteSampler(self.sample_rate, self.sample_rates))
+        self.handler.queue_logging = self
+        # Flask's own stderr handler is written to by the listener as well.
+        self.listener = QueueListener(self.handler.queue, file_handler, default_handler)
+        app.logger.removeHandler(default_handler)
+        # The app's logger is shared by every app built in this process;
+        # replace what an earlier init_app() installed there.
+        for handler in list(app.logger.handlers):
+            if isinstance(handler, RequestQueueHandler):
+                app.logger.removeHandler(handler)
+                handler.queue_logging.stop()
+                _instances.discard(handler.queue_logging)
+        app.logger.setLevel(self.level)
+        app.logger.addHandler(self.handler)
+        self.start()
+        _instances.add(self)
+
+    def start(self):
+        with self._lock:
+            if not self.running:
+                self.listener.start()
+                self.running = True
+
+    def stop(self):
+        """Write out what is queued and stop the listener thread."""
+        with self._lock:
+            if self.running:
+                self.listener.stop()
+                self.running = False
+
+    def _restart(self):
+        # Only the forking thread survives a fork, and the queue's lock may
+        # have been held by another: start over with a new queue, listener
+        # and thread.
+        if not self.running:
+            return
+        self._lock = threading.Lock()
+        self.handler.queue = queue.Queue(self.queue_size)
+        self.listener = QueueListener(self.handler.queue, *self.listener.handlers)
+        self.running = False
+        self.start()
+
+    def stats(self):
+        if self.handler is None:
+            return {'enabled': False}
+        return {
+            'enabled': True,
+            'queued': self.handler.queue.qsize(),
+            'dropped': self.handler.dropped,
+            'sampled_out': sum(sampler.sampled_out for sampler in self.handler.filters),
+        }
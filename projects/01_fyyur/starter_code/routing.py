@@ -0,0 +1,147 @@
+#----------------------------------------------------------------------------#
+# Read-replica routing.
+#
+# Each URI in REPLICA_DATABASE_URIS becomes a "replica_<n>" bind. Views
+# decorated with @replica_reads send their SELECTs to one of those binds,
+# picked round-robin or by lowest recent statement latency
+# (REPLICA_SELECTION) once per session, so that every read of a request
+# sees the same replica at the same lag. Everything else stays on the
+# primary: other views, non-SELECT statements, flushes, and every statement
+# of a session after it has written anything, so a request reads its own
+# writes. A write also stamps the client's Flask session, and that client's
+# reads stay on the primary for REPLICA_LAG_WINDOW seconds, so that the page
+# it is redirected to after an edit shows the edit. Pages rendered from a
+# replica that soon after any invalidation are not cached (see cache.py).
+#----------------------------------------------------------------------------#
+
+import itertools
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_app_context, has_request_context, session as client_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_PREFIX = 'replica_'
+# Applied to the latency of every replica not picked, so that one that was
+# slow for a while is tried, and measured, again.
+LATENCY_DECAY = 0.95
+
+
+def replica_binds(uris):
+    return {'{}{}'.format(REPLICA_PREFIX, i): uri for i, uri in enumerate(uris)}
+
+
+def replica_reads(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.replica_reads = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            g.replica_reads = False
+    return wrapper
+
+
+class ReplicaRouter(object):
+    """Sets up each app's replicas as a ReplicaSet in
+    app.extensions['replica_router'], where the session looks them up."""
+
+    def __init__(self, app=None, db=None):
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        replicas = ReplicaSet(app.config)
+        with app.app_context():
+            for key in replicas.keys:
+                replicas._watch(key, db.engines[key])
+        app.extensions['replica_router'] = replicas
+
+
+class ReplicaSet(object):
+    """One app's replica binds, selection strategy and measured latencies."""
+
+    def __init__(self, config):
+        self.strategy = config.get('REPLICA_SELECTION', 'round_robin')
+        self.lag_window = config.get('REPLICA_LAG_WINDOW', 5)
+        self.keys = sorted(key for key in config.get('SQLALCHEMY_BINDS') or {} if key.startswith(REPLICA_PREFIX))
+        self.latency = {key: 0.0 for key in self.keys}
+        self._cycle = itertools.cycle(self.keys)
+        self._lock = threading.Lock()
+
+    def choose(self):
+        with self._lock:
+            if self.strategy != 'least_latency':
+                return next(self._cycle)
+            chosen = min(self.keys, key=self.latency.get)
+            for key in self.keys:
+                if key != chosen:
+                    self.latency[key] *= LATENCY_DECAY
+            return chosen
+
+    def _watch(self, key, engine):
+        # Exponentially weighted statement latency per replica.
+        @event.listens_for(engine, 'before_cursor_execute')
+        def started(conn, cursor, statement, parameters, context, executemany):
+            conn.info['replica_started'] = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def finished(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info.pop('replica_started', time.perf_counter())
+            with self._lock:
+                self.latency[key] = 0.8 * self.latency[key] + 0.2 * elapsed
+
+
+def recently_wrote():
+    """Whether the current client wrote within the replica lag window."""
+    router = current_app.extensions.get('replica_router')
+    return has_request_context() and router is not None and \
+        client_session.get('wrote_at', 0) > time.time() - router.lag_window
+
+
+def read_engine(db):
+    """Engine for a long read outside the session, such as an export."""
+    router = current_app.extensions.get('replica_router')
+    if router is None or not router.keys:
+        return db.engine
+    return db.engines[router.choose()]
+
+
+class RoutingSession(Session):
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica(clause):
+            if 'replica' not in self.info:
+                self.info['replica'] = current_app.extensions['replica_router'].choose()
+            g.read_from_replica = True
+            return self._db.engines[self.info['replica']]
+        return super(RoutingSession, self).get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, clause):
+        if self._flushing or self.info.get('wrote') or not getattr(clause, 'is_select', False):
+            return False
+        if not has_app_context() or not g.get('replica_reads'):
+            return False
+        router = current_app.extensions.get('replica_router')
+        return router is not None and bool(router.keys) and not recently_wrote()
+
+
+def note_write(session):
+    session.info['wrote'] = True
+    if has_request_context():
+        router = current_app.extensions.get('replica_router')
+        if router is not None and router.keys:
+            client_session['wrote_at'] = time.time()
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def pin_after_flush(session, flush_context):
+    note_write(session)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def pin_after_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        note_write(orm_execute_state.session)
@@ -0,0 +1,225 @@
+#----------------------------------------------------------------------------#
+# Per-request SQL profiler.
+#
+#   profiler = SQLProfiler(app)      # or SQLProfiler().init_app(app)
+#
+# Off unless SQL_PROFILER_ENABLED is set, in the app config or the
+# environment. While on, every statement run during a request is counted
+# and timed, and its "shape" (the SQL with parameters and IN lists folded)
+# is tallied, so that one query run per row of another (N+1) shows up as a
+# shape repeated many times. Each response then gets
+#
+#   X-SQL-Queries, X-SQL-Time-Ms, X-SQL-Max-Repeat and a Server-Timing entry,
+#
+# one log line, and a contribution to the per-route report served as JSON at
+# SQL_PROFILER_REPORT_URL. A request over SQL_PROFILER_MAX_QUERIES,
+# SQL_PROFILER_MAX_TIME_MS or SQL_PROFILER_MAX_REPEATS logs a warning with
+# its slowest statements and repeated shapes, or, with
+# SQL_PROFILER_ON_THRESHOLD=raise, fails with QueryBudgetExceeded.
+#
+# This file is the only copy: the trivia API and the coffee shop API import
+# it through symlinks in their backends.
+#----------------------------------------------------------------------------#
+
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULTS = {
+    'SQL_PROFILER_ENABLED': False,
+    'SQL_PROFILER_MAX_QUERIES': 30,
+    'SQL_PROFILER_MAX_TIME_MS': 500,
+    'SQL_PROFILER_MAX_REPEATS': 5,
+    'SQL_PROFILER_ON_THRESHOLD': 'warn',
+    'SQL_PROFILER_SLOWEST': 5,
+    'SQL_PROFILER_REPORT_URL': '/_stats/sql',
+}
+
+PARAMETER = re.compile(r"%\(\w+\)s|%s|\?|(?<![:\w]):\w+|\$\d+|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PARAMETER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+WHITESPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def statement_shape(statement):
+    """The statement with its literals and parameters replaced by '?'."""
+    shape = PARAMETER.sub('?', WHITESPACE.sub(' ', statement.strip()))
+    return PARAMETER_LIST.sub('(?...)', shape)
+
+
+class RequestProfile(object):
+
+    def __init__(self, keep_slowest):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+        self.slowest = []
+        self.keep_slowest = keep_slowest
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+        entry = (seconds, self.count, statement)
+        if len(self.slowest) < self.keep_slowest:
+            heapq.heappush(self.slowest, entry)
+        else:
+            heapq.heappushpop(self.slowest, entry)
+
+    @property
+    def max_repeat(self):
+        return max(self.shapes.values()) if self.shapes else 0
+
+    def repeated(self, minimum):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= minimum]
+
+    def slowest_statements(self):
+        return [(seconds, statement) for seconds, _, statement in sorted(self.slowest, reverse=True)]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and g.get('sql_profile') is not None:
+        conn.info.setdefault('sql_profiler_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('sql_profiler_started')
+    if not started:
+        return
+    seconds = time.perf_counter() - started.pop()
+    if has_request_context() and g.get('sql_profile') is not None:
+        g.sql_profile.record(statement, seconds)
+
+
+def _handle_error(context):
+    # A statement that raised never reaches after_cursor_execute; drop its
+    # start time so that the next one is not timed from it.
+    started = context.connection.info.get('sql_profiler_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+class SQLProfiler(object):
+    """Gives each app its own ProfilerState, in app.extensions['sql_profiler']."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['sql_profiler'] = ProfilerState(app)
+
+    def report(self):
+        return current_app.extensions['sql_profiler'].report()
+
+
+class ProfilerState(object):
+    """One app's settings and per-route totals."""
+
+    def __init__(self, app):
+        self.routes = {}
+        self._lock = threading.Lock()
+        for name, default in DEFAULTS.items():
+            value = app.config.get(name, os.environ.get(name, default))
+            if isinstance(default, bool) and isinstance(value, str):
+                value = value.lower() in ('1', 'true', 'yes', 'on')
+            elif isinstance(default, int) and not isinstance(default, bool):
+                value = float(value) if name.endswith('_MS') else int(value)
+            setattr(self, name[len('SQL_PROFILER_'):].lower(), value)
+        if not self.enabled:
+            return
+
+        # Registered on the Engine class once per process, so that every
+        # engine (binds, replicas) of every app is covered.
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        if self.report_url:
+            app.add_url_rule(self.report_url, 'sql_profiler_report', lambda: jsonify(self.report()))
+        self.logger = app.logger
+        # Outside debug mode Flask leaves its logger at WARNING, which would
+        # swallow the per-request lines.
+        if not self.logger.isEnabledFor(logging.INFO):
+            self.logger.setLevel(logging.INFO)
+
+    def _start(self):
+        g.sql_profile = RequestProfile(self.slowest)
+
+    def _finish(self, response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+        route = '{} {}'.format(request.method, request.url_rule.rule if request.url_rule else request.path)
+        milliseconds = profile.seconds * 1000
+        self._aggregate(route, profile)
+
+        response.headers['X-SQL-Queries'] = str(profile.count)
+        response.headers['X-SQL-Time-Ms'] = '{:.1f}'.format(milliseconds)
+        response.headers['X-SQL-Max-Repeat'] = str(profile.max_repeat)
+        response.headers.add('Server-Timing', 'sql;dur={:.1f};desc="{} queries"'.format(milliseconds, profile.count))
+        self.logger.info('sql %s queries=%d time=%.1fms max_repeat=%d',
+                         route, profile.count, milliseconds, profile.max_repeat)
+
+        exceeded = []
+        if profile.count > self.max_queries:
+            exceeded.append('{} queries > {}'.format(profile.count, self.max_queries))
+        if milliseconds > self.max_time_ms:
+            exceeded.append('{:.1f}ms > {}ms'.format(milliseconds, self.max_time_ms))
+        if profile.max_repeat > self.max_repeats:
+            exceeded.append('a statement repeated {} times > {}'.format(profile.max_repeat, self.max_repeats))
+        if exceeded:
+            message = 'SQL budget exceeded by {}: {}\n{}'.format(route, '; '.join(exceeded), self._details(profile))
+            if self.on_threshold == 'raise':
+                raise QueryBudgetExceeded(message)
+            self.logger.warning(message)
+        return response
+
+    def _details(self, profile):
+        lines = ['slowest:']
+        lines += ['  {:8.1f}ms  {}'.format(seconds * 1000, statement_shape(statement)[:200])
+                  for seconds, statement in profile.slowest_statements()]
+        repeated = profile.repeated(2)
+        if repeated:
+            lines.append('repeated:')
+            lines += ['  {:6d}x  {}'.format(count, shape[:200]) for shape, count in repeated[:self.slowest]]
+        return '\n'.join(lines)
+
+    def _aggregate(self, route, profile):
+        with self._lock:
+            stats = self.routes.setdefault(route, {
+                'requests': 0, 'queries': 0, 'seconds': 0.0, 'max_queries': 0, 'max_repeat': 0, 'shapes': Counter()})
+            stats['requests'] += 1
+            stats['queries'] += profile.count
+            stats['seconds'] += profile.seconds
+            stats['max_queries'] = max(stats['max_queries'], profile.count)
+            stats['max_repeat'] = max(stats['max_repeat'], profile.max_repeat)
+            for shape, count in profile.repeated(2):
+                stats['shapes'][shape] = max(stats['shapes'][shape], count)
+
+    def report(self):
+        """Per route: request count, average and worst query counts and time, and the most repeated shapes."""
+        with self._lock:
+            return {route: {
+                'requests': stats['requests'],
+                'queries_avg': round(float(stats['queries']) / stats['requests'], 2),
+                'queries_max': stats['max_queries'],
+                'time_ms_avg': round(stats['seconds'] * 1000 / stats['requests'], 3),
+                'time_ms_total': round(stats['seconds'] * 1000, 3),
+                'max_repeat': stats['max_repeat'],
+                'repeated': [{'shape': shape, 'count': count}
+                             for shape, count in stats['shapes'].most_common(self.slowest)],
+            } for route, stats in self.routes.items()}
@@ -0,0 +1,131 @@
+import time
+import unittest
+
+from flask import Flask, flash
+
+from cache import PageCache, SimpleBackend
+
+
+def entry(body=b'page'):
+    now = time.time()
+    return {'body': body, 'status': 200, 'content_type': 'text/html', 'fresh_until': now + 60,
+            'stale_until': now + 120}
+
+
+class SimpleBackendTestCase(unittest.TestCase):
+    """Tag bookkeeping, LRU eviction and the generation guard."""
+
+    def setUp(self):
+        self.backend = SimpleBackend(max_entries=2)
+
+    def test_delete_tags_removes_tagged_entries(self):
+        self.backend.set('/venues?', entry(), ['venues'])
+        self.backend.set('/venues/1?', entry(), ['venues', 'venue:1'])
+        self.backend.set('/artists?', entry(), ['artists'])
+        self.assertEqual(self.backend.delete_tags(['venue:1']), 1)
+        self.assertIsNone(self.backend.get('/venues/1?'))
+        self.assertIsNotNone(self.backend.get('/artists?'))
+
+    def test_tag_sets_only_hold_stored_keys(self):
+        self.backend.set('/venues/1?', entry(), ['venues', 'venue:1'])
+        self.backend.set('/venues/1?', entry(), ['venues'])
+        self.assertNotIn('venue:1', self.backend._tags)
+        self.backend.delete('/venues/1?')
+        self.assertEqual(self.backend._tags, {})
+        self.assertEqual(self.backend._entry_tags, {})
+
+    def test_evicts_least_recently_used(self):
+        self.backend.set('/a?', entry(), ['a'])
+        self.backend.set('/b?', entry(), ['b'])
+        self.backend.get('/a?')
+        self.backend.set('/c?', entry(), ['c'])
+        self.assertIsNone(self.backend.get('/b?'))
+        self.assertIsNotNone(self.backend.get('/a?'))
+        self.assertNotIn('b', self.backend._tags)
+
+    def test_set_refused_after_invalidation(self):
+        generation = self.backend.generation()
+        self.backend.delete_tags(['venues'])
+        self.assertFalse(self.backend.set('/venues?', entry(), ['venues'], generation))
+        self.assertIsNone(self.backend.get('/venues?'))
+        self.assertTrue(self.backend.set('/venues?', entry(), ['venues'], self.backend.generation()))
+        self.assertGreater(self.backend.invalidated_at(), 0)
+
+
+class PageCacheTestCase(unittest.TestCase):
+    """Hits, misses, invalidation and stale-while-revalidate on a bare app."""
+
+    def setUp(self):
+        self.renders = 0
+        self.page_cache = PageCache()
+        self.app = Flask(__name__)
+        self.app.config.update(SECRET_KEY='test', PAGE_CACHE_TIMEOUT=60, PAGE_CACHE_STALE_TIMEOUT=60)
+
+        @self.app.route('/venues/<int:venue_id>')
+        @self.page_cache.cached('venues', 'venue:{venue_id}')
+        def venue(venue_id):
+            self.renders += 1
+            return 'venue {} render {}'.format(venue_id, self.renders)
+
+        @self.app.route('/flash')
+        def flash_message():
+            flash('Venue was successfully listed!')
+            return ''
+
+        self.client = self.app.test_client()
+
+    def init(self, **config):
+        self.app.config.update(config)
+        self.page_cache.init_app(self.app)
+
+    def test_hit_after_miss(self):
+        self.init()
+        first = self.client.get('/venues/1')
+        second = self.client.get('/venues/1')
+        self.assertEqual(first.headers['X-Cache'], 'MISS')
+        self.assertEqual(second.headers['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(self.renders, 1)
+
+    def test_invalidate_by_view_argument_tag(self):
+        self.init()
+        self.client.get('/venues/1')
+        self.client.get('/venues/2')
+        with self.app.app_context():
+            self.assertEqual(self.page_cache.invalidate('venue:1'), 1)
+        self.assertEqual(self.client.get('/venues/1').headers['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/venues/2').headers['X-Cache'], 'HIT')
+
+    def test_write_during_render_is_not_cached(self):
+        @self.app.route('/racing')
+        @self.page_cache.cached('venues')
+        def racing():
+            self.page_cache.invalidate('venues')
+            return 'rendered before the write committed'
+
+        self.init()
+        self.client.get('/racing')
+        self.assertEqual(self.client.get('/racing').headers['X-Cache'], 'MISS')
+
+    def test_stale_entry_served_while_refreshed(self):
+        self.init(PAGE_CACHE_TIMEOUT=0)
+        self.client.get('/venues/1')
+        stale = self.client.get('/venues/1')
+        self.assertEqual(stale.headers['X-Cache'], 'STALE')
+        self.assertEqual(stale.data, b'venue 1 render 1')
+        state = self.app.extensions['page_cache']
+        deadline = time.time() + 5
+        while (state._refreshing or self.renders < 2) and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.renders, 2)
+        self.assertEqual(self.client.get('/venues/1').data, b'venue 1 render 2')
+
+    def test_pending_flash_bypasses_cache(self):
+        self.init()
+        self.client.get('/flash')
+        self.assertNotIn('X-Cache', self.client.get('/venues/1').headers)
+        self.assertEqual(self.app.extensions['page_cache'].stats()['bypasses'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
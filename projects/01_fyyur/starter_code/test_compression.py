@@ -0,0 +1,109 @@
+import gzip
+import unittest
+import zlib
+
+from flask import Flask, Response
+
+from compression import Compress, brotli_available
+
+PAGE = ('<li>The Musical Hop</li>' * 200).encode()
+
+
+class CompressionTestCase(unittest.TestCase):
+    """Negotiation, the size threshold, HEAD, streaming and ETags."""
+
+    def setUp(self):
+        self.app = self.create_app(COMPRESS_ALGORITHMS=('gzip',))
+        self.client = self.app.test_client()
+
+    def create_app(self, **config):
+        app = Flask(__name__)
+        app.config.update(COMPRESS_MIN_SIZE=500, **config)
+
+        @app.route('/page')
+        def page():
+            response = Response(PAGE, content_type='text/html; charset=utf-8')
+            response.set_etag('abc')
+            return response
+
+        @app.route('/small')
+        def small():
+            return 'ok'
+
+        @app.route('/image')
+        def image():
+            return Response(PAGE, content_type='image/png')
+
+        @app.route('/no-transform')
+        def no_transform():
+            return Response(PAGE, content_type='text/html', headers={'Cache-Control': 'no-transform'})
+
+        @app.route('/stream')
+        def stream():
+            return Response((PAGE[i:i + 100] for i in range(0, len(PAGE), 100)), content_type='text/csv')
+
+        Compress(app)
+        return app
+
+    def get(self, path, encoding='gzip', client=None, **kwargs):
+        return (client or self.client).get(path, headers={'Accept-Encoding': encoding}, **kwargs)
+
+    def test_compresses_with_exact_length(self):
+        response = self.get('/page')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.headers['Content-Length'], str(len(response.data)))
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.data), PAGE)
+
+    def test_weak_etag_when_encoded(self):
+        self.assertEqual(self.get('/page').headers['ETag'], 'W/"abc"')
+        self.assertEqual(self.get('/page', encoding='identity').headers['ETag'], '"abc"')
+
+    def test_negotiation(self):
+        for encoding in ('', 'identity', 'gzip;q=0', 'br'):
+            response = self.get('/page', encoding=encoding)
+            self.assertNotIn('Content-Encoding', response.headers, encoding)
+            self.assertEqual(response.data, PAGE)
+        self.assertEqual(self.get('/page', encoding='deflate, gzip;q=0.5').headers['Content-Encoding'], 'gzip')
+
+    @unittest.skipUnless(brotli_available(), 'brotli is not installed')
+    def test_prefers_brotli(self):
+        client = self.create_app(COMPRESS_ALGORITHMS=('br', 'gzip')).test_client()
+        self.assertEqual(self.get('/page', 'gzip, br', client).headers['Content-Encoding'], 'br')
+        self.assertEqual(self.get('/page', 'gzip, br;q=0.5', client).headers['Content-Encoding'], 'gzip')
+
+    def test_passes_through_small_and_excluded_responses(self):
+        for path in ('/small', '/image', '/no-transform'):
+            response = self.get(path)
+            self.assertNotIn('Content-Encoding', response.headers, path)
+        self.assertEqual(self.get('/small').headers['Vary'], 'Accept-Encoding')
+        self.assertNotIn('Vary', self.get('/image').headers)
+
+    def test_head_matches_get(self):
+        get = self.get('/page')
+        head = self.client.head('/page', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(head.data, b'')
+        for name in ('Content-Encoding', 'Content-Length', 'ETag', 'Vary'):
+            self.assertEqual(head.headers[name], get.headers[name], name)
+
+    def test_streams_chunk_by_chunk(self):
+        response = self.get('/stream', buffered=False)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response.headers)
+        chunks = [chunk for chunk in response.response if chunk]
+        response.close()
+        self.assertGreater(len(chunks), 2)
+        # Each flushed chunk decodes on its own, before the rest arrives.
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.assertEqual(decompressor.decompress(chunks[0]), PAGE[:500])
+        self.assertEqual(decompressor.decompress(b''.join(chunks[1:])), PAGE[500:])
+
+    def test_settings_kept_per_app(self):
+        other = self.create_app(COMPRESS_ENABLED=False)
+        self.assertNotIn('Content-Encoding', self.get('/page', client=other.test_client()).headers)
+        self.assertFalse(other.extensions['compress']['enabled'])
+        self.assertEqual(self.app.extensions['compress']['algorithms'], ('gzip',))
+
+
+if __name__ == '__main__':
+    unittest.main()
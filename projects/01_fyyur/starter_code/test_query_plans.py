@@ -0,0 +1,98 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import create_app
+from models import db, Artist, Show, Venue
+
+TEST_DATABASE_URL = os.environ.get('FYYUR_TEST_DATABASE_URL')
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, 'set FYYUR_TEST_DATABASE_URL to a scratch PostgreSQL database')
+class QueryPlanTestCase(unittest.TestCase):
+    """The Show indexes serve the detail pages and the /shows listing.
+
+    Tables this small are scanned sequentially whatever their indexes, so
+    the statements a route ran are explained with enable_seqscan off: the
+    planner then uses an index wherever one can serve the query.
+    """
+
+    def setUp(self):
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            'SQLALCHEMY_BINDS': {},
+            'REPLICA_DATABASE_URIS': [],
+            'PAGE_CACHE_ENABLED': False,
+        })
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.metadata.drop_all(db.engine)
+            db.metadata.create_all(db.engine)
+            venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+            artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock n Roll'])
+            db.session.add_all([venue, artist])
+            db.session.flush()
+            now = datetime.now()
+            db.session.add_all([Show(venue_id=venue.id, artist_id=artist.id, start_time=now - timedelta(days=days))
+                                for days in (7, 14, 21)])
+            db.session.commit()
+            self.venue_id, self.artist_id = venue.id, artist.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.metadata.drop_all(db.engine)
+
+    def show_plans(self, path):
+        """The EXPLAIN output of each statement on "Show" that GET path ran."""
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if '"Show"' in statement:
+                statements.append((statement, parameters))
+
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            response = self.client.get(path)
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(statements, 'no statement on "Show" for ' + path)
+
+        with engine.connect() as connection:
+            connection.exec_driver_sql('SET enable_seqscan = off')
+            return ['\n'.join(line for line, in connection.exec_driver_sql('EXPLAIN ' + statement, parameters))
+                    for statement, parameters in statements]
+
+    def assertUsesIndex(self, plans, index):
+        self.assertIn(index, '\n'.join(plans))
+        for plan in plans:
+            self.assertNotIn('Seq Scan on "Show"', plan)
+
+    def test_venue_page_uses_venue_id_start_time_index(self):
+        self.assertUsesIndex(self.show_plans('/venues/{}'.format(self.venue_id)), 'ix_Show_venue_id_start_time')
+
+    def test_artist_page_uses_artist_id_start_time_index(self):
+        self.assertUsesIndex(self.show_plans('/artists/{}'.format(self.artist_id)), 'ix_Show_artist_id_start_time')
+
+    def test_api_venue_uses_venue_id_start_time_index(self):
+        self.assertUsesIndex(self.show_plans('/api/v1/venues/{}'.format(self.venue_id)),
+                             'ix_Show_venue_id_start_time')
+
+    def test_past_shows_listing_uses_start_time_index(self):
+        self.assertUsesIndex(self.show_plans('/shows'), 'ix_Show_start_time_id')
+
+    def test_past_shows_next_page_uses_start_time_index(self):
+        with self.app.app_context():
+            first = db.session.query(Show).order_by(Show.start_time, Show.id).first()
+            cursor = '{},{}'.format(first.start_time.isoformat(), first.id)
+        self.assertUsesIndex(self.show_plans('/shows?after=' + cursor), 'ix_Show_start_time_id')
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import unittest
+
+import time
+
+from flask import g, session
+from sqlalchemy import select
+
+from app import create_app
+from models import db, Venue
+
+TEST_DATABASE_URL = os.environ.get('FYYUR_TEST_DATABASE_URL')
+TEST_REPLICA_DATABASE_URL = os.environ.get('FYYUR_TEST_REPLICA_DATABASE_URL')
+
+
+@unittest.skipUnless(TEST_DATABASE_URL and TEST_REPLICA_DATABASE_URL,
+                     'set FYYUR_TEST_DATABASE_URL and FYYUR_TEST_REPLICA_DATABASE_URL to two scratch '
+                     'PostgreSQL databases')
+class ReplicaRoutingTestCase(unittest.TestCase):
+    """Reads of @replica_reads views go to a replica, one per session, and
+    back to the primary once the session has written.
+
+    The "replica" is a separate database holding different rows under the
+    same ids, so every response shows where it was read from. It is bound
+    twice, as replica_0 and replica_1, so that round-robin has a choice.
+    """
+
+    def setUp(self):
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            'SQLALCHEMY_BINDS': {},
+            'REPLICA_DATABASE_URIS': [TEST_REPLICA_DATABASE_URL, TEST_REPLICA_DATABASE_URL],
+            'REPLICA_SELECTION': 'round_robin',
+            'PAGE_CACHE_ENABLED': False,
+        })
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            for engine in (db.engine, db.engines['replica_0']):
+                db.metadata.drop_all(engine)
+                db.metadata.create_all(engine)
+            for engine, name in ((db.engine, 'Primary Hall'), (db.engines['replica_0'], 'Replica Hall')):
+                with engine.begin() as connection:
+                    connection.execute(Venue.__table__.insert().values(
+                        name=name, city='San Francisco', state='CA', genres=['Jazz']))
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            for engine in (db.engine, db.engines['replica_0']):
+                db.metadata.drop_all(engine)
+
+    def test_replica_reads_view_reads_from_replica(self):
+        self.assertIn(b'Replica Hall', self.client.get('/venues').data)
+        self.assertIn(b'Replica Hall', self.client.get('/venues/1').data)
+
+    def test_other_views_read_from_primary(self):
+        response = self.client.get('/venues/1/edit')
+        self.assertIn(b'Primary Hall', response.data)
+        self.assertNotIn(b'Replica Hall', response.data)
+
+    def test_session_stays_on_one_replica(self):
+        with self.app.test_request_context():
+            g.replica_reads = True
+            statement = select(Venue.name)
+            engines = {db.session.get_bind(clause=statement) for _ in range(4)}
+            self.assertEqual(len(engines), 1)
+            self.assertIn(engines.pop(), (db.engines['replica_0'], db.engines['replica_1']))
+
+    def test_sessions_alternate_replicas(self):
+        chosen = []
+        for _ in range(2):
+            with self.app.test_request_context():
+                g.replica_reads = True
+                db.session.execute(select(Venue.name)).all()
+                chosen.append(db.session.info['replica'])
+        self.assertEqual(sorted(chosen), ['replica_0', 'replica_1'])
+
+    def test_reads_fall_back_to_primary_after_write(self):
+        with self.app.test_request_context():
+            g.replica_reads = True
+            self.assertEqual(db.session.execute(select(Venue.name).where(Venue.id == 1)).scalar(), 'Replica Hall')
+            db.session.add(Venue(name='Fresh Hall', city='Oakland', state='CA', genres=['Folk']))
+            db.session.flush()
+            self.assertIs(db.session.get_bind(clause=select(Venue.name)), db.engine)
+            names = set(db.session.execute(select(Venue.name)).scalars())
+            self.assertEqual(names, {'Primary Hall', 'Fresh Hall'})
+            db.session.rollback()
+
+    def test_apps_keep_their_own_replicas(self):
+        primary_only = create_app({
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            'SQLALCHEMY_BINDS': {},
+            'REPLICA_DATABASE_URIS': [],
+            'PAGE_CACHE_ENABLED': False,
+        })
+        self.assertIn(b'Primary Hall', primary_only.test_client().get('/venues/1').data)
+        self.assertIn(b'Replica Hall', self.client.get('/venues/1').data)
+
+    def test_write_stamps_client_session(self):
+        with self.app.test_request_context():
+            db.session.add(Venue(name='Fresh Hall', city='Oakland', state='CA', genres=['Folk']))
+            db.session.flush()
+            self.assertAlmostEqual(session['wrote_at'], time.time(), delta=5)
+            db.session.rollback()
+
+    def test_client_reads_primary_after_its_write(self):
+        with self.client.session_transaction() as client_session:
+            client_session['wrote_at'] = time.time()
+        self.assertIn(b'Primary Hall', self.client.get('/venues/1').data)
+        self.assertIn(b'Replica Hall', self.app.test_client().get('/venues/1').data)
+
+    def test_replica_page_not_cached_right_after_invalidation(self):
+        page_cache = self.app.extensions['page_cache']
+        page_cache.enabled = True
+        try:
+            page_cache.invalidate('venues')
+            self.assertEqual(self.client.get('/venues').headers['X-Cache'], 'MISS')
+            self.assertEqual(self.client.get('/venues').headers['X-Cache'], 'MISS')
+            with self.client.session_transaction() as client_session:
+                client_session['wrote_at'] = time.time()
+            self.assertIn(b'Primary Hall', self.client.get('/venues').data)
+            self.assertEqual(self.app.test_client().get('/venues').headers['X-Cache'], 'HIT')
+        finally:
+            page_cache.enabled = False
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+#----------------------------------------------------------------------------#
+# Upcoming shows.
+#
+# UpcomingShow holds every show that has not started yet together with the
+# artist and venue columns the pages display, so the detail pages and the
+# /shows listing read one narrow table instead of joining three.
+#
+# It is kept up to date in the same transaction as the change:
+#   - add_shows() after shows are created (form or import),
+#   - refresh_artist() / refresh_venue() after an edit,
+#   - deleted shows, artists and venues cascade to it.
+# Readers always filter on start_time >= now, so rows of shows that have
+# since started are merely dead weight until "flask refresh-upcoming" prunes
+# them; run it from cron every few minutes. --rebuild recreates the table
+# from Show.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from models import db, Artist, Show, UpcomingShow, Venue
+
+COLUMNS = ('show_id', 'start_time', 'artist_id', 'artist_name', 'artist_image_link',
+           'venue_id', 'venue_name', 'venue_image_link', 'city', 'state')
+
+
+def upcoming_select(*criteria):
+    return select(Show.id, Show.start_time, Show.artist_id, Artist.name, Artist.image_link,
+                  Show.venue_id, Venue.name, Venue.image_link, Venue.city, Venue.state). \
+        join(Artist, Artist.id == Show.artist_id).join(Venue, Venue.id == Show.venue_id). \
+        where(Show.start_time >= datetime.now(), *criteria)
+
+
+def add_shows(*criteria):
+    """Insert, or bring up to date, the upcoming shows matching criteria."""
+    statement = insert(UpcomingShow).from_select(COLUMNS, upcoming_select(*criteria))
+    statement = statement.on_conflict_do_update(
+        index_elements=[UpcomingShow.show_id],
+        set_={column: statement.excluded[column] for column in COLUMNS[1:]})
+    return db.session.execute(statement).rowcount
+
+
+def refresh_artist(artist):
+    return db.session.execute(update(UpcomingShow).where(UpcomingShow.artist_id == artist.id).values(
+        artist_name=artist.name, artist_image_link=artist.image_link)).rowcount
+
+
+def refresh_venue(venue):
+    return db.session.execute(update(UpcomingShow).where(UpcomingShow.venue_id == venue.id).values(
+        venue_name=venue.name, venue_image_link=venue.image_link, city=venue.city, state=venue.state)).rowcount
+
+
+def prune():
+    """Remove shows that have started."""
+    return db.session.execute(delete(UpcomingShow).where(UpcomingShow.start_time < datetime.now())).rowcount
+
+
+def rebuild():
+    db.session.execute(delete(UpcomingShow))
+    return add_shows()
+
+
+@click.command('refresh-upcoming')
+@click.option('--rebuild', 'full', is_flag=True, help='Recreate the table from Show instead of pruning it.')
+@with_appcontext
+def refresh_upcoming(full):
+    """Drop started shows from UpcomingShow, or rebuild it."""
+    if full:
+        click.echo('{} upcoming shows.'.format(rebuild()))
+    else:
+        click.echo('{} started shows removed.'.format(prune()))
+    db.session.commit()
@@ -0,0 +1 @@
+../../../01_fyyur/starter_code/compression.py
\ No newline at end of file
@@ -5,6 +5,8 @@ from flask_cors import CORS
 import random
 
 from models import setup_db, Question, Category
+from sql_profiler import SQLProfiler
+from compression import Compress
 
 QUESTIONS_PER_PAGE = 10
 
@@ -12,6 +14,8 @@ def create_app(test_config=None):
   # create and configure the app
   app = Flask(__name__)
   setup_db(app)
+  SQLProfiler(app)
+  Compress(app)
   
   '''
   @TODO: Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs
@@ -0,0 +1 @@
+../../../01_fyyur/starter_code/sql_profiler.py
\ No newline at end of file
@@ -6,9 +6,13 @@ from flask_cors import CORS
 
 from .database.models import db_drop_and_create_all, setup_db, Drink
 from .auth.auth import AuthError, requires_auth
+from .sql_profiler import SQLProfiler
+from .compression import Compress
 
 app = Flask(__name__)
 setup_db(app)
+SQLProfiler(app)
+Compress(app)
 CORS(app)
 
 '''